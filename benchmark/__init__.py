@@ -0,0 +1,10 @@
+"""Cargas de trabalho e ferramentas de medição do simulador.
+
+Importar o pacote não carrega o matplotlib: `benchmark.report` só o importa
+quando um gráfico é pedido.
+"""
+import time
+
+STARTED = time.perf_counter()  # Início da importação do pacote: a CLI mede sua partida a partir daqui
+
+from .workload import FIXED_COMMANDS, Scenario, build_scenarios, generate_random_commands, run_test_sequence
@@ -0,0 +1,70 @@
+import argparse
+import json
+import random
+import time
+from collections import namedtuple
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+from . import STARTED
+from .workload import FIXED_COMMANDS, build_scenarios, generate_random_commands, run_test_sequence
+
+def run_fixed(seed=None):
+    """Roteiro fixo e uma carga aleatória de 50 comandos, cada um em um disco de 500 blocos."""
+    random_commands = generate_random_commands(50, seed=seed)
+    return {
+        "Teste Fixo": run_test_sequence(FileSystem(disk_size=500), FIXED_COMMANDS, "log_fixed.txt"),
+        "Teste Aleatório": run_test_sequence(FileSystem(disk_size=500), random_commands, "log_random.txt"),
+    }
+
+def run_scenarios(seed=None):
+    """Os cinco cenários de teste, cada um em um disco novo."""
+    times = {}
+    for number, scenario in enumerate(build_scenarios(seed), 1):
+        print(f"Executando Cenário {number}: Teste de {scenario.label}...")
+        fs = FileSystem(disk_size=scenario.disk_size)
+        times[scenario.label] = run_test_sequence(fs, scenario.commands, scenario.log_file)
+    return times
+
+# Carga: função que a executa e retorna {rótulo: segundos}, e o gráfico
+# (arquivo padrão, título, rótulo do eixo x e opções de bar_chart)
+Suite = namedtuple("Suite", "run plot_file title xlabel chart_options")
+
+SUITES = {
+    "fixed": Suite(run_fixed, "performance_comparison.png", "Comparação de Desempenho", "Tipo de Teste", {}),
+    "scenarios": Suite(run_scenarios, "test_scenarios_performance.png", "Tempo de Execução dos Cenários",
+                       "Cenários de Teste", {"figsize": (10, 6), "color": "skyblue", "rotation": 45}),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Executa as cargas de teste do simulador e mede seus tempos.")
+    parser.add_argument("suite", choices=sorted(SUITES), help="fixed: roteiro fixo e aleatório; scenarios: os cinco cenários")
+    parser.add_argument("--seed", type=int,
+                        help="semente das cargas aleatórias (padrão: uma nova, sorteada e informada, a cada execução)")
+    parser.add_argument("--plot", nargs="?", const="", metavar="ARQUIVO",
+                        help="grava o gráfico dos tempos (requer matplotlib); sem ARQUIVO, usa o nome padrão da carga")
+    parser.add_argument("--show", action="store_true", help="também exibe o gráfico em uma janela")
+    parser.add_argument("--output", help="grava os tempos e a partida em JSON")
+    args = parser.parse_args(argv)
+    if args.seed is None:
+        # Sorteada aqui (e não dentro das cargas) para ser exibida e gravada: a execução pode ser repetida
+        args.seed = random.randrange(2 ** 32)
+
+    # Partida a frio: da importação do pacote até a primeira carga, sem o matplotlib
+    startup = time.perf_counter() - STARTED
+    suite = SUITES[args.suite]
+    times = suite.run(args.seed)
+    print(f"Partida: {startup * 1000:.1f} ms, Semente: {args.seed}")
+    for label, seconds in times.items():
+        print(f"{label:>24} {seconds * 1000:>10.2f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"suite": args.suite, "seed": args.seed, "startup_s": startup, "times_s": times},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}")
+    if args.plot is not None or args.show:
+        from .report import bar_chart  # Só aqui o matplotlib é carregado
+        path = args.plot or suite.plot_file
+        bar_chart(list(times), list(times.values()), path, suite.title, suite.xlabel, args.show,
+                  **suite.chart_options)
+        print(f"Gráfico gravado em {path}")
+    return 0
@@ -0,0 +1,38 @@
+def pyplot(show=False):
+    """Importa o matplotlib só quando um gráfico é pedido; sem `show`, sem janela (backend Agg)."""
+    import matplotlib
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def bar_chart(labels, values, path, title, xlabel, show=False, figsize=None, color=None, rotation=0):
+    """Grava em `path` um gráfico de barras dos tempos de execução (`show` também o exibe)."""
+    plt = pyplot(show)
+    plt.figure(figsize=figsize)
+    plt.bar(labels, values, color=color)
+    plt.title(title)
+    plt.ylabel("Tempo de Execução (s)")
+    plt.xlabel(xlabel)
+    if rotation:
+        plt.xticks(rotation=rotation)
+    plt.tight_layout()
+    plt.savefig(path)
+    if show:
+        plt.show()
+
+def fragmentation_chart(report, path):
+    """Grava em `path` as curvas de fragmentação e de extensões livres de cada política."""
+    plt = pyplot()
+    fig, (top, bottom) = plt.subplots(2, 1, sharex=True, figsize=(8, 7))
+    for policy, result in report["policies"].items():
+        cycles = [s["cycle"] for s in result["samples"]]
+        top.plot(cycles, [s["fragmentation"] for s in result["samples"]], label=policy)
+        bottom.plot(cycles, [s["free_extents"] for s in result["samples"]], label=policy)
+    top.set_ylabel("Fragmentação")
+    top.set_title("Fragmentação ao longo do tempo por política")
+    top.legend()
+    bottom.set_ylabel("Extensões livres")
+    bottom.set_xlabel("Ciclo")
+    fig.tight_layout()
+    fig.savefig(path)
@@ -0,0 +1,13 @@
+def percentile(sorted_values, fraction):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(samples):
+    """Resume amostras de tempo (ns) em mínimo, mediana e p95."""
+    ordered = sorted(samples)
+    return {
+        "min_ns": ordered[0],
+        "median_ns": percentile(ordered, 0.50),
+        "p95_ns": percentile(ordered, 0.95),
+        "samples": len(ordered),
+    }
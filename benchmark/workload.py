@@ -0,0 +1,212 @@
+import random
+import time
+from collections import namedtuple
+
+# Cenário de teste: nome curto, rótulo para gráficos, tamanho do disco,
+# comandos e arquivo de log usado por `python -m benchmark scenarios`
+Scenario = namedtuple("Scenario", "name label disk_size commands log_file")
+
+# Roteiro fixo de `python -m benchmark fixed`: três árvores de projeto com
+# arquivos em vários níveis, navegação de ida e volta e algumas escritas
+FIXED_COMMANDS = [
+    "mkdir docs",
+    "mkdir images",
+    "mkdir projects",
+    "create file1.txt 10",
+    "create file2.txt 15",
+    "create file3.txt 25",
+    "cd docs",
+    "mkdir reports",
+    "mkdir drafts",
+    "create report1.txt 20",
+    "create report2.txt 30",
+    "cd reports",
+    "create annual_report.txt 40",
+    "create monthly_report.txt 20",
+    "cd ..",
+    "cd drafts",
+    "create draft1.txt 10",
+    "create draft2.txt 5",
+    "write draft1.txt 'Initial draft content.'",
+    "write draft2.txt 'Draft 2 content.'",
+    "cd ..",
+    "ls",
+    "info",
+    "cd ..",
+    "cd images",
+    "mkdir raw",
+    "mkdir processed",
+    "create image1.png 50",
+    "create image2.jpg 40",
+    "cd raw",
+    "create raw_image1.png 30",
+    "create raw_image2.png 35",
+    "cd ..",
+    "cd processed",
+    "create processed_image1.png 25",
+    "create processed_image2.jpg 20",
+    "cd ..",
+    "cd ..",
+    "cd projects",
+    "mkdir project1",
+    "mkdir project2",
+    "cd project1",
+    "create proj1_file1.txt 10",
+    "create proj1_file2.txt 20",
+    "write proj1_file1.txt 'Content for project 1 file 1.'",
+    "cd ..",
+    "cd project2",
+    "create proj2_file1.txt 15",
+    "create proj2_file2.txt 25",
+    "write proj2_file2.txt 'Content for project 2 file 2.'",
+    "ls",
+    "cd ..",
+    "cd ..",
+    "tree"
+]
+
+def run_test_sequence(fs, commands, log_file):
+    """Executa uma sequência de comandos, salva o log e exibe a estrutura final."""
+    with open(log_file, "w") as log:
+        start_time = time.time()
+        for result in fs.execute_batch(commands):
+            log.write(result.output + "\n")
+
+        # Adicionar comando tree no final do log
+        log.write("\nEstrutura final do sistema de arquivos:\n")
+        log.writelines(fs.iter_tree())
+        
+        # Adicionar comando info no final do log
+        log.write("\nInfo do sistema de arquivos:\n")
+        log.write(fs.info())
+        end_time = time.time()
+    return end_time - start_time
+
+def build_scenarios(seed=None):
+    """Monta os cinco cenários de teste.
+
+    O cenário de desempenho usa tamanhos aleatórios gerados a partir de
+    `seed`; com a mesma semente os comandos são sempre os mesmos.
+    """
+    rng = random.Random(seed)
+    performance = [f"create file{i}.txt {rng.randint(1, 50)}" for i in range(1, 50)]
+    return [
+        # Cenário 1: Teste de Alocação Básica
+        Scenario("alocacao", "Alocação Básica", 100, [
+            "create file1.txt 10",
+            "create file2.txt 15",
+            "create file3.txt 30",
+            "delete file2.txt",
+            "create file4.txt 20",
+            "info",
+            "tree",
+        ], "log_allocation.txt"),
+        # Cenário 2: Teste de Navegação e Hierarquia
+        Scenario("navegacao", "Navegação e Hierarquia", 100, [
+            "mkdir docs",
+            "mkdir images",
+            "cd docs",
+            "mkdir reports",
+            "mkdir drafts",
+            "create report1.txt 10",
+            "cd reports",
+            "create annual_report.txt 20",
+            "cd ..",
+            "cd drafts",
+            "create draft1.txt 5",
+            "cd ..",
+            "cd ..",
+            "cd images",
+            "mkdir raw",
+            "mkdir processed",
+            "info",
+            "tree",
+        ], "log_navigation.txt"),
+        # Cenário 3: Teste de Limite de Espaço
+        Scenario("limite", "Limite de Espaço", 100, [
+            "create file1.txt 30",
+            "create file2.txt 30",
+            "create file3.txt 30",
+            "create file4.txt 20",  # Deve falhar
+            "delete file1.txt",
+            "create file4.txt 20",  # Deve ser bem-sucedido agora
+            "info",
+            "tree",
+        ], "log_limit.txt"),
+        # Cenário 4: Teste de Operações em Arquivos
+        Scenario("operacoes", "Operações em Arquivos", 100, [
+            "create file1.txt 10",
+            "write file1.txt 'This is a test file.'",
+            "read file1.txt",
+            "delete file1.txt",
+            "read file1.txt",  # Deve falhar
+            "info",
+            "tree",
+        ], "log_operations.txt"),
+        # Cenário 5: Teste de Desempenho
+        Scenario("desempenho", "Desempenho", 500, performance + ["info", "tree"], "log_performance.txt"),
+    ]
+
+def generate_random_commands(num_commands, max_size=10, seed=None):
+    """Gera uma sequência aleatória de comandos com estrutura mais complexa.
+
+    Com a mesma `seed` a sequência gerada é sempre a mesma.
+    """
+    rng = random.Random(seed)
+    commands = []
+    current_path = "/RAIZ"
+    created_dirs = ["RAIZ"]  # Diretórios já criados
+    created_files = []       # Arquivos já criados
+
+    for _ in range(num_commands):
+        action = rng.choice(["mkdir", "create", "cd", "ls", "info", "write", "read", "delete"])
+        
+        if action == "mkdir":
+            dir_name = f"dir_{rng.randint(1, 100)}"
+            commands.append(f"mkdir {dir_name}")
+            created_dirs.append(dir_name)
+        
+        elif action == "create" and created_dirs:
+            file_name = f"file_{rng.randint(1, 100)}"
+            size = rng.randint(1, max_size)
+            commands.append(f"create {file_name} {size}")
+            created_files.append(file_name)
+        
+        elif action == "cd" and created_dirs:
+            # Navegar para um diretório aleatório
+            dir_name = rng.choice(created_dirs)
+            if dir_name != "RAIZ":  # Não navegar para a raiz se já estiver nela
+                commands.append(f"cd {dir_name}")
+                current_path = f"{current_path}/{dir_name}"
+        
+        elif action == "ls":
+            commands.append("ls")
+        
+        elif action == "info":
+            commands.append("info")
+        
+        elif action == "write" and created_files:
+            file_name = rng.choice(created_files)
+            commands.append(f"write {file_name} 'Random data for {file_name}'")
+        
+        elif action == "read" and created_files:
+            file_name = rng.choice(created_files)
+            commands.append(f"read {file_name}")
+        
+        elif action == "delete" and (created_files or created_dirs):
+            if rng.choice(["file", "dir"]) == "file" and created_files:
+                file_name = rng.choice(created_files)
+                commands.append(f"delete {file_name}")
+                created_files.remove(file_name)
+            elif created_dirs:
+                dir_name = rng.choice(created_dirs)
+                if dir_name != "RAIZ":  # Não deletar a raiz
+                    commands.append(f"delete {dir_name}")
+                    created_dirs.remove(dir_name)
+    
+    # Garantir que terminamos na raiz e executamos o comando tree
+    if current_path != "/RAIZ":
+        commands.append("cd /RAIZ")
+    commands.append("tree")
+    commands.append("info")
+    return commands
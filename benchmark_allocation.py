@@ -0,0 +1,60 @@
+import argparse
+import json
+import time
+from benchmark.workload import generate_random_commands
+from main import ALLOCATION_ENGINES, FileSystem, read_trace  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def load_commands(args):
+    """Comandos do trace dado ou, sem ele, da carga aleatória gerada com a semente."""
+    if args.trace:
+        header, records = read_trace(args.trace)
+        return [record["c"] for record in records], header.get("disk_size", args.disk_size)
+    return generate_random_commands(args.commands, args.max_size, args.seed), args.disk_size
+
+def run_engine(engine, commands, disk_size, block_size):
+    """Executa os comandos com um motor de alocação e mede tempo, falhas e custos."""
+    fs = FileSystem(disk_size, block_size=block_size, engine=engine)
+    ops = fs.compile_commands(commands)
+    start = time.perf_counter_ns()
+    results = fs.execute_batch(ops)
+    elapsed = time.perf_counter_ns() - start
+    report = fs.allocation_costs()
+    report.update({
+        "elapsed_ns": elapsed,
+        "allocation_failures": sum(result.output == "Erro: Espaço insuficiente." for result in results),
+        "free_blocks": fs.disk.get_free_space(),
+        "fragmentation": fs.disk.fragmentation(),
+    })
+    fs.close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os motores de alocação (contígua, encadeada e indexada) no mesmo trace.")
+    parser.add_argument("--trace", help="trace JSONL a reexecutar (padrão: carga aleatória gerada)")
+    parser.add_argument("--commands", type=int, default=20000)
+    parser.add_argument("--max-size", type=int, default=40, help="tamanho máximo dos arquivos da carga gerada")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--disk-size", type=int, default=2000)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--engine", choices=sorted(ALLOCATION_ENGINES), action="append", help="compara só este motor")
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    commands, disk_size = load_commands(args)
+    results = {engine: run_engine(engine, commands, disk_size, args.block_size)
+               for engine in args.engine or ALLOCATION_ENGINES}
+    print(f"{'Motor':<11} {'Tempo (ms)':>10} {'Falhas':>7} {'Arquivos':>9} {'Extensões/arq.':>15} "
+          f"{'Leitura aleatória':>18} {'Leitura amostrada':>18} {'Metadados (B)':>14} {'Fragmentação':>13}")
+    for engine, r in results.items():
+        print(f"{engine:<11} {r['elapsed_ns'] / 1e6:>10.1f} {r['allocation_failures']:>7} {r['files']:>9} "
+              f"{r['extents_per_file']:>15.2f} {r['mean_read_cost']:>18.2f} {r['sampled_read_cost']:>18.2f} "
+              f"{r['metadata_bytes']:>14} "
+              f"{r['fragmentation']:>13.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"commands": len(commands), "disk_size": disk_size, "engines": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
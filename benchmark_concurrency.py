@@ -0,0 +1,63 @@
+import sys
+import threading
+import time
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def client_commands(directory, client, num_ops):
+    """Roteiro de um cliente: cria, escreve, lê, lista e exclui seus arquivos em `directory`."""
+    commands = [f"cd /RAIZ/{directory}"]
+    for i in range(num_ops // 5):
+        name = f"cliente_{client}_arquivo_{i}"
+        commands += [
+            f"create {name} 2",
+            f"write {directory}/{name} dados_{i}",
+            f"read {directory}/{name}",
+            "ls" if i % 10 else "info",
+            f"delete cliente_{client}_arquivo_{i - 1}" if i else "info",
+        ]
+    return commands
+
+def run_workload(num_threads, num_ops, shared):
+    """Executa `num_threads` clientes concorrentes e retorna (ops/s, erros, disco consistente)."""
+    fs = FileSystem(disk_size=num_threads * num_ops, defrag_budget=4)
+    directories = ["compartilhado"] * num_threads if shared else [f"cliente_{i}" for i in range(num_threads)]
+    for directory in set(directories):
+        fs.mkdir(directory)
+    scripts = [fs.compile_commands(client_commands(d, i, num_ops)) for i, d in enumerate(directories)]
+    errors = [0] * num_threads
+    barrier = threading.Barrier(num_threads + 1)
+
+    def client(index):
+        session = fs.open_session()  # Diretório atual próprio de cada cliente
+        barrier.wait()
+        results = fs.execute_batch(scripts[index], session)
+        errors[index] = sum(result.status == "Erro" for result in results)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    # O índice de extensões livres deve coincidir com o mapa de blocos
+    disk = fs.disk
+    consistent = (list(disk.free_runs()) == [(start, disk.free_extents.lengths[start])
+                                             for start in disk.free_extents.starts]
+                  and disk.free_count == sum(n for _, n in disk.free_runs()))
+    fs.close()
+    return sum(len(script) for script in scripts) / elapsed, sum(errors), consistent
+
+def main():
+    num_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'Modo':>14} {'Threads':>8} {'Ops/s':>10} {'Erros':>6} {'Consistente':>12}")
+    for shared in (False, True):
+        for num_threads in (1, 2, 4, 8):
+            ops, errors, consistent = run_workload(num_threads, num_ops, shared)
+            mode = "compartilhado" if shared else "separado"
+            print(f"{mode:>14} {num_threads:>8} {ops:>10.0f} {errors:>6} {'sim' if consistent else 'NÃO':>12}")
+
+if __name__ == "__main__":
+    main()
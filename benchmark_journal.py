@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import time
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def run_workload(path, commit_interval, num_ops):
+    """Cria e exclui arquivos em uma imagem nova e mede a vazão (operações por segundo)."""
+    fs = FileSystem(disk_size=num_ops * 4, image=path, commit_interval=commit_interval)
+    fs.mkdir("dados")
+    fs.cd("dados")
+    start_time = time.perf_counter()
+    for i in range(num_ops):
+        if i % 4 == 3:
+            fs.delete(f"arquivo_{i - 1}.txt")
+        else:
+            fs.create_file(f"arquivo_{i}.txt", 2)
+    fs.sync()
+    elapsed = time.perf_counter() - start_time
+    journal = fs.image.journal
+    commits, fsyncs = journal.commits, journal.fsyncs
+    fs.close()
+    return num_ops / elapsed, commits, fsyncs
+
+def main():
+    num_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'Intervalo de commit':>20} {'Ops/s':>10} {'Commits':>8} {'fsyncs':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for commit_interval in (1, 8, 64, 512):
+            path = os.path.join(tmp, f"journal_{commit_interval}.img")
+            ops, commits, fsyncs = run_workload(path, commit_interval, num_ops)
+            print(f"{commit_interval:>20} {ops:>10.0f} {commits:>8} {fsyncs:>7}")
+
+if __name__ == "__main__":
+    main()
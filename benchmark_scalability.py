@@ -0,0 +1,189 @@
+import argparse
+import json
+import math
+import sys
+import time
+from benchmark.timing import summarize
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+# Inclinação máxima aceita na reta log-log (latência x parâmetro) de cada
+# operação: ~0 = O(1) ou O(log n), ~1 = linear, ~2 = quadrática
+EXPECTED_SLOPES = {
+    "disk_size": {"create_file": 0.3, "delete": 0.3, "write": 0.3, "read": 0.3, "info": 0.3},
+    "files": {"create_file": 0.3, "delete": 0.3, "write": 0.3, "read": 0.3, "cd": 0.3,
+              "info": 0.3, "find": 0.3, "ls": 1.3, "tree": 1.3},
+    # Os caminhos têm `depth` componentes; na árvore, a indentação de cada linha também cresce
+    "depth": {"create_file": 1.3, "delete": 1.3, "write": 1.3, "read": 1.3, "cd": 1.3,
+              "info": 0.3, "ls": 0.3, "tree": 2.3},
+    # `fanout` subdiretórios na raiz, cada um com `fanout` arquivos
+    "fanout": {"create_file": 0.3, "delete": 0.3, "cd": 0.3, "info": 0.3, "ls": 1.3, "tree": 2.3},
+}
+
+SWEEPS = {
+    "disk_size": [10 ** e for e in range(3, 9)],
+    "files": [10 ** e for e in range(2, 6)],
+    "depth": [1, 10, 100, 1000],
+    "fanout": [2, 4, 8, 16, 32, 64, 128],
+}
+QUICK_SWEEPS = {
+    "disk_size": [10 ** e for e in range(3, 7)],
+    "files": [10 ** e for e in range(2, 5)],
+    "depth": [1, 10, 100],
+    "fanout": [2, 4, 8, 16, 32],
+}
+
+def measure(op, undo=None, min_time=0.05, max_reps=200):
+    """Mede `op` repetidamente (ao menos 3 vezes); `undo` desfaz seu efeito fora da medição."""
+    samples = []
+    deadline = time.perf_counter_ns() + int(min_time * 1e9)
+    while len(samples) < 3 or (len(samples) < max_reps and time.perf_counter_ns() < deadline):
+        start = time.perf_counter_ns()
+        op()
+        samples.append(time.perf_counter_ns() - start)
+        if undo is not None:
+            undo()
+    return summarize(samples)
+
+def file_ops(fs, size, write_path):
+    """Operações sobre arquivos do diretório atual: (operação, desfazer) por nome."""
+    return {
+        "create_file": (lambda: fs.create_file("sonda", size), lambda: fs.delete("sonda")),
+        "delete": (lambda: fs.delete("vitima"), lambda: fs.create_file("vitima", size)),
+        "write": (lambda: fs.write(write_path, "dados"), None),
+        "read": (lambda: fs.read(write_path), None),
+        "info": (fs.info, None),
+    }
+
+def build_disk_size(size):
+    # Disco meio cheio e fragmentado: 1000 arquivos, metade excluída
+    fs = FileSystem(size, backend="bitmap")
+    chunk = max(1, size // 2000)
+    for i in range(1000):
+        fs.create_file(f"f_{i}", chunk)
+    for i in range(1, 1000, 2):
+        fs.delete(f"f_{i}")
+    fs.create_file("vitima", chunk)
+    fs.create_file("alvo", 1)
+    return fs, file_ops(fs, chunk, "alvo")
+
+def build_files(count):
+    fs = FileSystem(2 * count + 100)
+    fs.mkdir("sub")
+    for i in range(count):
+        fs.create_file(f"f_{i}", 1)
+    fs.create_file("vitima", 1)
+    fs.create_file("alvo", 1)
+    ops = file_ops(fs, 1, "alvo")
+    ops["cd"] = (lambda: fs.cd("sub"), lambda: fs.cd(".."))
+    ops["find"] = (lambda: fs.find(pattern="alvo"), None)  # Pelo índice de nomes, sem percorrer a árvore
+    ops["ls"] = (fs.ls, None)
+    ops["tree"] = (fs.tree, None)
+    return fs, ops
+
+def build_depth(depth):
+    # Cadeia de `depth` diretórios; as operações partem do mais profundo
+    fs = FileSystem(1000)
+    names = [f"n{i}" for i in range(depth)]
+    for name in names:
+        fs.mkdir(name)
+        fs.cd(name)
+    fs.create_file("vitima", 1)
+    fs.create_file("alvo", 1)
+    ops = file_ops(fs, 1, "/".join(names + ["alvo"]))
+    deep = "/RAIZ/" + "/".join(names)
+    ops["cd"] = (lambda: fs.cd(deep), None)
+    ops["ls"] = (fs.ls, None)
+    ops["tree"] = (fs.tree, None)
+    return fs, ops
+
+def build_fanout(fanout):
+    fs = FileSystem(fanout * fanout + 100)
+    for i in range(fanout):
+        fs.mkdir(f"d_{i}")
+        fs.cd(f"d_{i}")
+        for j in range(fanout):
+            fs.create_file(f"f_{j}", 1)
+        fs.cd("..")
+    fs.create_file("vitima", 1)
+    ops = file_ops(fs, 1, "vitima")
+    del ops["write"], ops["read"]
+    ops["cd"] = (lambda: fs.cd("d_0"), lambda: fs.cd(".."))
+    ops["ls"] = (fs.ls, None)
+    ops["tree"] = (fs.tree, None)
+    return fs, ops
+
+BUILDERS = {"disk_size": build_disk_size, "files": build_files, "depth": build_depth, "fanout": build_fanout}
+
+def fit_slope(points):
+    """Inclinação da reta de mínimos quadrados em escala log-log."""
+    xs = [math.log10(x) for x, _ in points]
+    ys = [math.log10(max(y, 1)) for _, y in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread if spread else 0.0
+
+def run_sweep(name, values):
+    """Mede todas as operações da varredura; retorna {"points": ..., "slopes": ...}."""
+    points = {}
+    for value in values:
+        fs, ops = BUILDERS[name](value)
+        points[value] = {op: measure(*pair) for op, pair in ops.items()}
+        fs.close()
+    ops = points[values[0]].keys()
+    slopes = {op: fit_slope([(value, points[value][op]["median_ns"]) for value in values]) for op in ops}
+    return {"points": {str(value): result for value, result in points.items()}, "slopes": slopes}
+
+def check(results, baseline=None, threshold=2.0):
+    """Lista as regressões: inclinações acima do esperado e medianas acima de `threshold` x a base."""
+    failures = []
+    for sweep, result in results.items():
+        for op, slope in result["slopes"].items():
+            limit = EXPECTED_SLOPES[sweep].get(op)
+            if limit is not None and slope > limit:
+                failures.append(f"{sweep}/{op}: inclinação {slope:.2f} acima de {limit}")
+        if baseline is None or sweep not in baseline:
+            continue
+        for value, ops in result["points"].items():
+            for op, stats in ops.items():
+                base = baseline[sweep]["points"].get(value, {}).get(op)
+                if base and stats["median_ns"] > threshold * base["median_ns"]:
+                    failures.append(f"{sweep}={value}/{op}: mediana {stats['median_ns'] / base['median_ns']:.2f}x a da base")
+    return failures
+
+def print_sweep(name, result):
+    ops = list(result["slopes"])
+    print(f"\n{name} (mediana por operação, µs)")
+    print(f"{name:>12} " + " ".join(f"{op:>12}" for op in ops))
+    for value, stats in result["points"].items():
+        print(f"{value:>12} " + " ".join(f"{stats[op]['median_ns'] / 1000:>12.2f}" for op in ops))
+    print(f"{'inclinação':>12} " + " ".join(f"{result['slopes'][op]:>12.2f}" for op in ops))
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede como a latência de cada comando escala com o tamanho do sistema de arquivos.")
+    parser.add_argument("--quick", action="store_true", help="varreduras menores (discos até 1e6 blocos)")
+    parser.add_argument("--sweep", choices=sorted(SWEEPS), action="append", help="executa só esta varredura")
+    parser.add_argument("--output", default="benchmark_scalability.json")
+    parser.add_argument("--baseline", help="resultado JSON anterior para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=2.0, help="razão máxima entre a mediana e a da base")
+    args = parser.parse_args()
+
+    sweeps = QUICK_SWEEPS if args.quick else SWEEPS
+    results = {}
+    for name in args.sweep or sweeps:
+        results[name] = run_sweep(name, sweeps[name])
+        print_sweep(name, results[name])
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSÃO: {failure}")
+    print(f"\nResultados gravados em {args.output}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
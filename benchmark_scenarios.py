@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmark.timing import summarize
+from benchmark.workload import build_scenarios
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def run_trials(name, seed, trials):
+    """Executa `trials` vezes um cenário, cada vez em um FileSystem novo.
+
+    Roda no processo de trabalho; retorna os tempos de cada execução, em ns.
+    """
+    scenario = next(s for s in build_scenarios(seed) if s.name == name)
+    ops = FileSystem.compile_commands(scenario.commands)
+    FileSystem(scenario.disk_size).execute_batch(ops)  # Aquecimento, descartado
+    samples = []
+    for _ in range(trials):
+        fs = FileSystem(scenario.disk_size)
+        start = time.perf_counter_ns()
+        fs.execute_batch(ops)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+def run_benchmark(seed, trials, jobs):
+    """Distribui as execuções de todos os cenários entre `jobs` processos."""
+    scenarios = build_scenarios(seed)
+    chunk = -(-trials // jobs)
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = {
+            scenario.name: [pool.submit(run_trials, scenario.name, seed, min(chunk, trials - done))
+                            for done in range(0, trials, chunk)]
+            for scenario in scenarios
+        }
+        results = {}
+        for scenario in scenarios:
+            samples = [ns for future in futures[scenario.name] for ns in future.result()]
+            results[scenario.name] = {
+                "label": scenario.label,
+                "commands": len(scenario.commands),
+                **summarize(samples),
+                "samples_ns": samples,
+            }
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "trials": trials,
+        "jobs": jobs,
+        "scenarios": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa os cenários de teste em paralelo e mede sua distribuição de tempos.")
+    parser.add_argument("--trials", type=int, default=200, help="execuções por cenário")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="processos de trabalho")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_scenarios.json")
+    parser.add_argument("--baseline", help="resultado JSON anterior para comparar as medianas")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.seed, args.trials, args.jobs)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["scenarios"]
+    print(f"{'Cenário':>24} {'Mín (µs)':>10} {'Mediana (µs)':>13} {'p95 (µs)':>10}" + (f" {'vs. base':>9}" if baseline else ""))
+    for name, result in report["scenarios"].items():
+        line = (f"{result['label']:>24} {result['min_ns'] / 1000:>10.1f} "
+                f"{result['median_ns'] / 1000:>13.1f} {result['p95_ns'] / 1000:>10.1f}")
+        if baseline and name in baseline:
+            line += f" {result['median_ns'] / baseline[name]['median_ns']:>8.2f}x"
+        print(line)
+    print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import importlib.util
+import json
+import random
+import time
+from main import ALLOCATION_POLICIES, VirtualDisk  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def hole_stats(disk):
+    """Fragmentação e buracos livres lidos do mapa de blocos (vetorizado no backend numpy)."""
+    runs = list(disk.free_runs())
+    free = sum(length for _, length in runs)
+    largest = max((length for _, length in runs), default=0)
+    return {
+        "free_blocks": free,
+        "free_extents": len(runs),
+        "largest_free_run": largest,
+        "mean_hole": free / len(runs) if runs else 0.0,
+        "fragmentation": 1 - largest / free if free else 0.0,
+    }
+
+def run_policy(policy, disk_size, cycles, batch, max_size, target, seed, backend, sample_every):
+    """Simula `cycles` ciclos de alocação/liberação em lote com uma política.
+
+    Em cada ciclo são pedidas `batch` alocações de 1 a `max_size` blocos;
+    enquanto a ocupação passar de `target`, `batch` arquivos aleatórios são
+    liberados. Com a mesma `seed` todas as políticas recebem os mesmos pedidos.
+    """
+    rng = random.Random(seed)
+    disk = VirtualDisk(disk_size, policy, backend=backend)
+    live = []  # Extensões de cada arquivo vivo
+    failures = requests = 0
+    samples = []
+    start = time.perf_counter()
+    for cycle in range(1, cycles + 1):
+        sizes = [rng.randint(1, max_size) for _ in range(batch)]
+        for extents in disk.allocate_batch(sizes):
+            if extents is None:
+                failures += 1
+            else:
+                live.append(extents)
+        requests += batch
+        if (disk_size - disk.get_free_space()) / disk_size > target:
+            victims = []
+            for _ in range(min(batch, len(live))):
+                # Remoção por troca com o último: O(1) por arquivo
+                i = rng.randrange(len(live))
+                live[i], live[-1] = live[-1], live[i]
+                victims += live.pop()
+            disk.free_batch(victims)
+        if cycle % sample_every == 0 or cycle == cycles:
+            sample = {"cycle": cycle, "utilization": 1 - disk.get_free_space() / disk_size,
+                      "failure_rate": failures / requests, **hole_stats(disk)}
+            samples.append(sample)
+    return {"elapsed_s": time.perf_counter() - start, "samples": samples}
+
+def main():
+    parser = argparse.ArgumentParser(description="Estudo de fragmentação: curvas ao longo do tempo para cada política de alocação.")
+    parser.add_argument("--disk-size", type=int, default=1_000_000)
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500, help="alocações por ciclo")
+    parser.add_argument("--max-size", type=int, default=64, help="tamanho máximo de cada alocação, em blocos")
+    parser.add_argument("--target", type=float, default=0.8, help="ocupação a partir da qual há liberações")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", default=None,
+                        help="mapa de blocos (numpy, bitmap ou list; padrão: numpy se instalado, senão bitmap)")
+    parser.add_argument("--sample-every", type=int, default=20, help="ciclos entre amostras")
+    parser.add_argument("--policy", choices=ALLOCATION_POLICIES, action="append", help="estuda só esta política")
+    parser.add_argument("--output", default="fragmentation_study.json")
+    parser.add_argument("--plot", help="grava as curvas em uma imagem (requer matplotlib)")
+    args = parser.parse_args()
+    if args.backend is None:
+        args.backend = "numpy" if importlib.util.find_spec("numpy") else "bitmap"
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "plot")},
+        "policies": {},
+    }
+    print(f"{'Política':>8} {'Tempo (s)':>10} {'Fragmentação':>13} {'Extensões':>10} {'Falhas':>8}")
+    for policy in args.policy or ALLOCATION_POLICIES:
+        result = run_policy(policy, args.disk_size, args.cycles, args.batch, args.max_size,
+                            args.target, args.seed, args.backend, args.sample_every)
+        report["policies"][policy] = result
+        last = result["samples"][-1]
+        print(f"{policy:>8} {result['elapsed_s']:>10.2f} {last['fragmentation']:>13.3f} "
+              f"{last['free_extents']:>10} {last['failure_rate']:>8.2%}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.plot:
+        from benchmark.report import fragmentation_chart  # Só aqui o matplotlib é carregado
+        fragmentation_chart(report, args.plot)
+    print(f"Resultados gravados em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+from benchmark.timing import percentile
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+from server import CommandServer, read_response
+
+def client_commands(client, num_requests):
+    """Roteiro de uma conexão: trabalha em um diretório próprio."""
+    directory = f"conexao_{client}"
+    commands = [f"mkdir {directory}", f"cd {directory}"]
+    i = 0
+    while len(commands) < num_requests:
+        name = f"arquivo_{i}"
+        commands += [
+            f"create {name} 1",
+            f"write {directory}/{name} dados_{i}",
+            f"read {directory}/{name}",
+            "ls",
+            f"delete {name}",
+        ]
+        i += 1
+    return commands[:num_requests]
+
+async def run_client(client, connect, num_requests, window, latencies):
+    """Envia as requisições com até `window` delas pendentes e mede a latência de cada uma."""
+    reader, writer = await connect()
+    commands = client_commands(client, num_requests)
+    sent = []  # Instante de envio das requisições ainda sem resposta, em ordem
+    errors = 0
+    received = 0
+    next_command = 0
+    while received < len(commands):
+        # Preenche a janela de pipelining antes de esperar respostas
+        while next_command < len(commands) and len(sent) - received < window:
+            writer.write(commands[next_command].encode() + b"\n")
+            sent.append(time.perf_counter())
+            next_command += 1
+        await writer.drain()
+        status, _ = await read_response(reader)
+        latencies.append(time.perf_counter() - sent[received])
+        errors += status == "Erro"
+        received += 1
+    writer.write(b"exit\n")
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+async def run_load(connections, num_requests, window, address=None):
+    """Abre `connections` conexões simultâneas; sem `address`, sobe um servidor local.
+
+    Retorna (latências ordenadas, erros, segundos).
+    """
+    server = None
+    tmp = None
+    if address is None:
+        # Servidor no próprio processo, em um socket Unix temporário
+        tmp = tempfile.TemporaryDirectory()
+        address = os.path.join(tmp.name, "servidor.sock")
+        command_server = CommandServer(FileSystem(disk_size=connections * 4))
+        server = await command_server.start(path=address)
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        connect = lambda: asyncio.open_connection(host, int(port))
+    else:
+        connect = lambda: asyncio.open_unix_connection(address)
+
+    latencies = []
+    start_time = time.perf_counter()
+    errors = await asyncio.gather(*(
+        run_client(i, connect, num_requests, window, latencies) for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - start_time
+    if server is not None:
+        # Espera o servidor encerrar as conexões que os clientes fecharam
+        while command_server.connections:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        tmp.cleanup()
+    return sorted(latencies), sum(errors), elapsed
+
+def raise_file_limit():
+    # Cada conexão usa dois descritores quando servidor e clientes estão no mesmo processo
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga para o servidor do simulador.")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50, help="requisições por conexão")
+    parser.add_argument("--window", type=int, default=8, help="requisições pendentes por conexão")
+    parser.add_argument("--address", help="HOST:PORTA ou caminho de socket Unix (padrão: servidor local)")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    latencies, errors, elapsed = asyncio.run(
+        run_load(args.connections, args.requests, args.window, args.address)
+    )
+    print(f"Conexões: {args.connections}, Requisições: {len(latencies)}, Erros: {errors}")
+    print(f"Vazão: {len(latencies) / elapsed:.0f} req/s em {elapsed:.2f} s")
+    print(f"Latência p50: {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,260 +1,3316 @@
+import argparse
+import array
+import bisect
+import contextlib
+import fnmatch
+import functools
+import itertools
+import json
+import mmap
 import os
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict, deque, namedtuple
+
+# Tamanho padrão de um bloco do disco, em bytes
+BLOCK_SIZE = 512
+
+# Granularidade das páginas da imagem de disco mapeada em memória
+PAGE_SIZE = mmap.ALLOCATIONGRANULARITY
+
+# Políticas de escolha da extensão livre usada em uma alocação
+ALLOCATION_POLICIES = ("first", "best", "next")
+
+def synchronized(method):
+    """Executa o método segurando o lock do objeto (`self.lock`)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+# Índice das extensões (sequências contíguas) de blocos livres
+class FreeExtentIndex:
+    MAX_LEAVES = 1 << 18  # Folhas da árvore de máximos (até 4 MiB por índice)
+
+    def __init__(self, size, runs=None):
+        self.starts = []   # Inícios das extensões, em ordem de endereço
+        self.lengths = {}  # Início -> comprimento
+        self.ends = {}     # Fim (exclusivo) -> início
+        self.by_size = []  # (comprimento, início), em ordem de tamanho
+        # Árvore de máximos em ordem de endereço (first-fit e next-fit em
+        # O(log n)): cada folha cobre `bucket` blocos e guarda a maior extensão
+        # que começa neles; tree[1] é a raiz e tree[2i], tree[2i+1] os filhos de i
+        self.bucket = max(1, -(-size // self.MAX_LEAVES))
+        self.leaves = 1
+        while self.leaves * self.bucket < size:
+            self.leaves *= 2
+        self.tree = array.array("q", bytes(16 * self.leaves))
+        if runs is None:
+            if size > 0:
+                self._add(0, size)
+                self._refresh(0)
+            return
+        tree, leaves, bucket = self.tree, self.leaves, self.bucket
+        for start, length in runs:
+            self.starts.append(start)
+            self.lengths[start] = length
+            self.ends[start + length] = start
+            self.by_size.append((length, start))
+            leaf = leaves + start // bucket
+            tree[leaf] = max(tree[leaf], length)
+        self.by_size.sort()
+        for i in range(leaves - 1, 0, -1):
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+
+    @classmethod
+    def from_runs(cls, runs, size):
+        """Constrói o índice de um disco de `size` blocos a partir de extensões livres em ordem de endereço."""
+        return cls(size, runs)
+
+    def copy(self):
+        index = FreeExtentIndex(0)
+        index.starts, index.by_size = self.starts.copy(), self.by_size.copy()
+        index.lengths, index.ends = self.lengths.copy(), self.ends.copy()
+        index.bucket, index.leaves, index.tree = self.bucket, self.leaves, array.array("q", self.tree)
+        return index
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _add(self, start, length):
+        bisect.insort(self.starts, start)
+        self.lengths[start] = length
+        self.ends[start + length] = start
+        bisect.insort(self.by_size, (length, start))
+
+    def _remove(self, start):
+        length = self.lengths.pop(start)
+        del self.ends[start + length]
+        del self.starts[bisect.bisect_left(self.starts, start)]
+        del self.by_size[bisect.bisect_left(self.by_size, (length, start))]
+        return length
+
+    def _bucket_starts(self, b, position=0):
+        # Inícios das extensões que começam no balde `b`, a partir de `position`
+        bucket = self.bucket
+        lo = bisect.bisect_left(self.starts, max(b * bucket, position))
+        return self.starts[lo:bisect.bisect_left(self.starts, (b + 1) * bucket)]
+
+    def _refresh(self, *starts):
+        """Recalcula as folhas dos baldes de `starts` e seus ancestrais.
+
+        Os inícios incluídos vêm antes dos removidos: quando uma extensão só
+        muda de balde, a subida para no ancestral comum, cujo máximo não muda.
+        """
+        tree, bucket, lengths = self.tree, self.bucket, self.lengths
+        done = None
+        for start in starts:
+            b = start // bucket
+            if b == done:
+                continue
+            done = b
+            if bucket == 1:
+                value = lengths.get(b, 0)
+            else:
+                value = max(map(lengths.__getitem__, self._bucket_starts(b)), default=0)
+            i = self.leaves + b
+            tree[i] = value
+            while i > 1:
+                sibling = tree[i ^ 1]
+                if sibling > value:
+                    value = sibling
+                i >>= 1
+                if tree[i] == value:
+                    break  # Os ancestrais não mudam
+                tree[i] = value
+
+    def _search(self, size, position=0):
+        """Início da primeira extensão com pelo menos `size` blocos que começa em `position` ou depois."""
+        tree, leaves = self.tree, self.leaves
+        # A partir do início do disco, a descida começa na raiz; senão, na folha
+        # de `position`, subindo até uma subárvore à direita com uma extensão suficiente
+        i = leaves + position // self.bucket if position else 1
+        while tree[i] < size:
+            while i & 1:
+                if i == 1:
+                    return None
+                i >>= 1
+            i += 1
+        # Desce pelo filho mais à esquerda que ainda a tenha
+        while i < leaves:
+            i = 2 * i if tree[2 * i] >= size else 2 * i + 1
+        b = i - leaves
+        for start in self._bucket_starts(b, position):
+            if self.lengths[start] >= size:
+                return start
+        # O máximo do primeiro balde estava antes de `position`: segue no próximo
+        return self._search(size, (b + 1) * self.bucket) if b + 1 < leaves else None
+
+    def insert(self, start, length):
+        """Devolve uma extensão ao índice, fundindo-a com as vizinhas livres."""
+        removed = []
+        if start in self.ends:
+            left = self.ends[start]
+            length += self._remove(left)
+            removed.append(start)
+            start = left
+        if start + length in self.lengths:
+            removed.append(start + length)
+            length += self._remove(start + length)
+        self._add(start, length)
+        self._refresh(start, *removed)
+
+    def take(self, start, length):
+        """Retira [start, start + length) da extensão livre que o contém."""
+        i = bisect.bisect_right(self.starts, start) - 1
+        run_start = self.starts[i]
+        run_end = run_start + self._remove(run_start)
+        if start > run_start:
+            self._add(run_start, start - run_start)
+        if run_end > start + length:
+            self._add(start + length, run_end - start - length)
+            self._refresh(start + length, run_start)
+        else:
+            self._refresh(run_start)
+
+    def covers(self, start, length):
+        """Indica se [start, start + length) está inteiramente livre."""
+        i = bisect.bisect_right(self.starts, start) - 1
+        return i >= 0 and start + length <= self.starts[i] + self.lengths[self.starts[i]]
+
+    def first(self):
+        """Extensão livre de menor endereço, como (início, comprimento)."""
+        return (self.starts[0], self.lengths[self.starts[0]]) if self.starts else None
+
+    def largest(self):
+        return self.by_size[-1][0] if self.by_size else 0
+
+    def first_fit(self, size):
+        """Primeira extensão, em ordem de endereço, com pelo menos `size` blocos (O(log n))."""
+        return self._search(size)
+
+    def best_fit(self, size):
+        """Menor extensão com pelo menos `size` blocos (busca binária)."""
+        i = bisect.bisect_left(self.by_size, (size, -1))
+        return self.by_size[i][1] if i < len(self.by_size) else None
+
+    def rover_position(self, rover):
+        """Posição em `starts` de onde o next-fit parte: a extensão que contém `rover` ou a seguinte."""
+        i = bisect.bisect_right(self.starts, rover) - 1
+        if i < 0 or self.starts[i] + self.lengths[self.starts[i]] <= rover:
+            i += 1
+        return i
+
+    def next_fit(self, size, rover):
+        """Como first-fit, mas começando na posição da última alocação e dando a volta no disco."""
+        i = self.rover_position(rover)
+        start = self._search(size, self.starts[i]) if i < len(self.starts) else None
+        return self._search(size) if start is None else start
+
+# Mapa de blocos como lista Python: um elemento (0 ou 1) por bloco
+class BlockList(list):
+    def __init__(self, size):
+        super().__init__([0] * size)
+
+    def copy(self):
+        clone = BlockList(0)
+        clone[:] = self
+        return clone
+
+    def set_range(self, start, length, value):
+        self[start:start + length] = [value] * length
+
+    def set_extents(self, extents, value):
+        for start, length in extents:
+            self.set_range(start, length, value)
+
+    def free_runs(self):
+        """Gera as extensões livres (início, comprimento) em ordem de endereço."""
+        pos = 0
+        for value, group in itertools.groupby(self):
+            length = sum(1 for _ in group)
+            if value == 0:
+                yield pos, length
+            pos += length
+
+# Mapa de blocos compacto: um bit por bloco (0 = livre, 1 = ocupado)
+class Bitmap:
+    _NOT_FULL = re.compile(rb"[^\xff]")
+    _NOT_EMPTY = re.compile(rb"[^\x00]")
+
+    def __init__(self, size, bits=None):
+        self.size = size
+        self.dirty = None  # Páginas alteradas (só rastreadas quando é um conjunto)
+        # Arredonda para palavras de 64 bits; os bits excedentes ficam ocupados
+        self.padding = (size + 63) // 64 * 64 - size
+        if bits is not None:
+            self.bits = bytearray(bits)
+            return
+        self.bits = bytearray((size + 63) // 64 * 8)
+        self.set_range(size, self.padding, 1)
+
+    def __len__(self):
+        return self.size
+
+    def copy(self):
+        return Bitmap(self.size, self.bits)
+
+    def __getitem__(self, block):
+        return (self.bits[block >> 3] >> (block & 7)) & 1
+
+    def __setitem__(self, block, value):
+        self.set_range(block, 1, value)
+
+    def set_range(self, start, length, value):
+        """Marca [start, start + length) como livre (0) ou ocupado (1)."""
+        if length <= 0:
+            return
+        end = start + length
+        if self.dirty is not None:
+            self.dirty.update(range((start >> 3) // PAGE_SIZE, ((end - 1) >> 3) // PAGE_SIZE + 1))
+        first_byte, last_byte = (start + 7) >> 3, end >> 3
+        if first_byte > last_byte:
+            # Intervalo contido em um único byte
+            self._apply(start >> 3, ((1 << length) - 1) << (start & 7), value)
+            return
+        if start & 7:
+            self._apply(start >> 3, (0xFF << (start & 7)) & 0xFF, value)
+        self.bits[first_byte:last_byte] = (b"\xff" if value else b"\x00") * (last_byte - first_byte)
+        if end & 7:
+            self._apply(last_byte, (1 << (end & 7)) - 1, value)
+
+    def set_extents(self, extents, value):
+        for start, length in extents:
+            self.set_range(start, length, value)
+
+    def _apply(self, index, mask, value):
+        if value:
+            self.bits[index] |= mask
+        else:
+            self.bits[index] &= ~mask & 0xFF
+
+    def count(self, value):
+        """Conta blocos livres ou ocupados por contagem de população (popcount)."""
+        used = int.from_bytes(self.bits, "little").bit_count() - self.padding
+        return used if value else self.size - used
+
+    def free_runs(self):
+        """Gera as extensões livres (início, comprimento) em ordem de endereço.
+
+        Os trechos totalmente ocupados ou totalmente livres são saltados por
+        busca em C sobre os bytes; apenas os bytes de fronteira são
+        examinados bit a bit.
+        """
+        bits = self.bits
+        pos = 0
+        while pos < self.size:
+            # Próximo bit livre a partir de `pos`
+            index = pos >> 3
+            value = bits[index] | ((1 << (pos & 7)) - 1)
+            if value == 0xFF:
+                match = self._NOT_FULL.search(bits, index + 1)
+                if match is None:
+                    return
+                index = match.start()
+                value = bits[index]
+            start = index * 8 + ((~value & (value + 1)).bit_length() - 1)
+            if start >= self.size:
+                return
+
+            # Próximo bit ocupado a partir de `start`
+            value = bits[index] & (0xFF << (start & 7)) & 0xFF
+            if value == 0:
+                match = self._NOT_EMPTY.search(bits, index + 1)
+                if match is None:
+                    yield start, self.size - start
+                    return
+                index = match.start()
+                value = bits[index]
+            end = min(index * 8 + ((value & -value).bit_length() - 1), self.size)
+            yield start, end - start
+            pos = end
+
+# Mapa de blocos em um array NumPy (um byte por bloco): lotes de extensões
+# são marcados e as extensões livres detectadas com operações vetorizadas
+class NumpyBlockMap:
+    def __init__(self, size):
+        # NumPy é opcional: só é importado quando este mapa de blocos é usado
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("O mapa de blocos 'numpy' requer o pacote NumPy (pip install numpy).") from None
+        self.size = size
+        self.blocks = np.zeros(size, dtype=np.uint8)
+
+    def __len__(self):
+        return self.size
+
+    def copy(self):
+        clone = NumpyBlockMap(0)
+        clone.size, clone.blocks = self.size, self.blocks.copy()
+        return clone
+
+    def __getitem__(self, block):
+        return int(self.blocks[block])
+
+    def __setitem__(self, block, value):
+        self.blocks[block] = value
+
+    def set_range(self, start, length, value):
+        self.blocks[start:start + length] = value
+
+    def set_extents(self, extents, value):
+        """Marca todas as extensões (início, comprimento) com uma única atribuição indexada."""
+        if len(extents) == 1:
+            self.set_range(*extents[0], value)
+            return
+        if not extents:
+            return
+        import numpy as np
+        runs = np.asarray(extents, dtype=np.int64)
+        starts, lengths = runs[:, 0], runs[:, 1]
+        # Para o k-ésimo bloco do lote: k + (início da extensão - blocos das extensões anteriores)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        self.blocks[np.arange(offsets.size) + offsets] = value
+
+    def count(self, value):
+        import numpy as np
+        used = int(np.count_nonzero(self.blocks))
+        return used if value else self.size - used
+
+    def free_runs(self):
+        """Extensões livres (início, comprimento) por run-length encoding vetorizado."""
+        import numpy as np
+        edge = np.ones(1, dtype=np.uint8)
+        # Com um bloco ocupado em cada ponta, as mudanças de valor alternam
+        # entre início (ocupado -> livre) e fim (livre -> ocupado) de extensão
+        changes = np.flatnonzero(np.diff(np.concatenate((edge, self.blocks, edge))))
+        starts, ends = changes[0::2], changes[1::2]
+        return list(zip(starts.tolist(), (ends - starts).tolist()))
+
+# Representações disponíveis para o mapa de blocos do disco
+BLOCK_MAP_BACKENDS = {"list": BlockList, "bitmap": Bitmap, "numpy": NumpyBlockMap}
+
+# Dispositivo de blocos simulado que guarda o conteúdo dos blocos
+class BlockDevice:
+    def __init__(self, num_blocks, block_size=BLOCK_SIZE, buffer=None, offset=0):
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        # Sem `buffer`, só os blocos escritos ocupam memória (Bloco -> bytes) e os
+        # demais são lidos como zeros; com `buffer` (a imagem mapeada em memória)
+        # o bloco `n` fica em buffer[offset + n * block_size]
+        self.data = {} if buffer is None else None
+        self.buffer = buffer
+        self.offset = offset
+        self.dirty = set()  # Blocos gravados no buffer desde o último sync
+        self.shared = False  # `data` compartilhado com um snapshot (copiado na próxima escrita)
+        self.reads = 0
+        self.writes = 0
+
+    def read_block(self, block):
+        self.reads += 1
+        if self.buffer is None:
+            return self.data.get(block, bytes(self.block_size))
+        start = self.offset + block * self.block_size
+        return self.buffer[start:start + self.block_size]
+
+    def write_block(self, block, data):
+        self.writes += 1
+        if self.buffer is None:
+            if self.shared:
+                self._unshare()
+            self.data[block] = bytes(data)
+            return
+        start = self.offset + block * self.block_size
+        self.buffer[start:start + self.block_size] = data
+        self.dirty.add(block)
+
+    def trim(self, extents):
+        """Descarta o conteúdo das extensões (início, comprimento) liberadas."""
+        if self.buffer is None:
+            if self.shared:
+                self._unshare()
+            for start, length in extents:
+                # Percorre o menor entre a extensão e os blocos efetivamente guardados
+                if length <= len(self.data):
+                    for block in range(start, start + length):
+                        self.data.pop(block, None)
+                else:
+                    for block in [b for b in self.data if start <= b < start + length]:
+                        del self.data[block]
+
+    def snapshot(self):
+        """Compartilha os dados dos blocos com um snapshot; o próximo a escrever os copia."""
+        if self.buffer is not None:
+            raise ValueError("Snapshots não são suportados com imagens de disco.")
+        self.shared = True
+        return self.data
+
+    def restore(self, num_blocks, block_size, data):
+        self.num_blocks, self.block_size = num_blocks, block_size
+        self.data = data
+        self.shared = True
+
+    def _unshare(self):
+        self.data = dict(self.data)
+        self.shared = False
+
+# Cache de páginas (um bloco por página) com substituição LRU
+class PageCache:
+    def __init__(self, device, capacity=64, write_back=True):
+        self.device = device
+        self.capacity = capacity
+        self.write_back = write_back  # False = write-through
+        self.pages = OrderedDict()    # Bloco -> bytearray, do menos ao mais recente
+        self.dirty = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def _page(self, block):
+        page = self.pages.get(block)
+        if page is not None:
+            self.hits += 1
+            self.pages.move_to_end(block)
+            return page
+        self.misses += 1
+        page = self.pages[block] = bytearray(self.device.read_block(block))
+        return page
+
+    def _evict(self):
+        while len(self.pages) > self.capacity:
+            victim, page = self.pages.popitem(last=False)
+            if victim in self.dirty:
+                self.dirty.discard(victim)
+                self.device.write_block(victim, page)
+
+    @synchronized
+    def read(self, block):
+        data = bytes(self._page(block))
+        self._evict()
+        return data
+
+    @synchronized
+    def write(self, block, data):
+        """Escreve `data` no início do bloco, preservando o restante."""
+        if len(data) == self.device.block_size and block not in self.pages:
+            # Bloco inteiro sobrescrito: dispensa a leitura do dispositivo
+            self.misses += 1
+            page = self.pages[block] = bytearray(data)
+        else:
+            page = self._page(block)
+            page[:len(data)] = data
+        if self.write_back:
+            self.dirty.add(block)
+        else:
+            self.device.write_block(block, page)
+        self._evict()
+
+    @synchronized
+    def flush(self):
+        """Grava no dispositivo todas as páginas sujas."""
+        for block in sorted(self.dirty):
+            self.device.write_block(block, self.pages[block])
+        self.dirty.clear()
+
+    @synchronized
+    def drop(self):
+        """Esquece todas as páginas, inclusive as sujas, sem gravá-las."""
+        self.pages.clear()
+        self.dirty.clear()
+
+    @synchronized
+    def discard(self, extents):
+        """Esquece extensões liberadas sem gravá-las e libera seu conteúdo no dispositivo."""
+        # O cache é pequeno: basta testar cada página contra as extensões
+        for block in [b for b in self.pages if any(s <= b < s + n for s, n in extents)]:
+            del self.pages[block]
+            self.dirty.discard(block)
+        self.device.trim(extents)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+def coalesce_extents(extents):
+    """Ordena extensões (início, comprimento) e funde as adjacentes."""
+    merged = []
+    for start, length in sorted(extents):
+        if merged and merged[-1][0] + merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], merged[-1][1] + length)
+        elif length > 0:
+            merged.append((start, length))
+    return merged
+
+def gather_free(index, size):
+    """Primeiras extensões livres, em ordem de endereço, que somam `size` blocos (ou None)."""
+    extents = []
+    for start in index.starts:
+        length = min(index.lengths[start], size)
+        extents.append((start, length))
+        size -= length
+        if size == 0:
+            return extents
+    return None
+
+def split_extents(extents, count):
+    """Divide extensões na ordem lógica: (os primeiros `count` blocos, o restante)."""
+    head, tail = [], []
+    for start, length in extents:
+        used = min(length, count)
+        if used:
+            head.append((start, used))
+            count -= used
+        if length > used:
+            tail.append((start + used, length - used))
+    return head, tail
+
+def append_extents(extents, new):
+    """Acrescenta `new` ao fim de `extents`, fundindo a primeira com a última se forem adjacentes."""
+    extents = list(extents)
+    for start, length in new:
+        if extents and sum(extents[-1]) == start:
+            extents[-1] = (extents[-1][0], extents[-1][1] + length)
+        else:
+            extents.append((start, length))
+    return extents
+
+def adjacent_free(disk, extents, size):
+    """[(fim do arquivo, size)] se os `size` blocos logo após `extents` estão livres, senão None."""
+    if extents and disk.free_extents.covers(sum(extents[-1]), size):
+        return [(sum(extents[-1]), size)]
+    return None
+
+# Motores de alocação: escolhem os blocos livres de cada arquivo e mantêm os
+# metadados da estratégia; o mapa de blocos e o índice de extensões livres
+# continuam com o VirtualDisk. Cada motor informa o custo de uma leitura
+# aleatória (acessos ao disco até o bloco lógico `offset`) e os bytes de
+# metadados de um arquivo. Para arquivos que crescem, `find_more` escolhe os
+# blocos acrescentados (de preferência os logo após o fim do arquivo) e
+# `extended` os liga ao arquivo; `truncated` ajusta os metadados antes de a
+# cauda ser liberada e retorna os blocos de metadados que sobraram.
+class ContiguousEngine:
+    """Alocação contígua: uma extensão por arquivo, escolhida pela política de encaixe."""
+    name = "contiguous"
+
+    def __init__(self, size, block_size):
+        pass  # Sem metadados além das extensões
+
+    def find(self, disk, size):
+        start = disk._find(size)
+        return None if start is None else [(start, size)]
+
+    def scanned(self, disk, extents):
+        return disk.extents_scanned(extents[0][0] if extents else None)
+
+    def allocated(self, extents, size):
+        return extents
+
+    def find_more(self, disk, extents, size, extra):
+        adjacent = adjacent_free(disk, extents, extra)
+        if adjacent:
+            return adjacent
+        # Uma nova extensão, até o limite do inode da imagem; além dele, o arquivo é realocado
+        return self.find(disk, extra) if len(extents) < INODE_EXTENTS else None
+
+    def extended(self, extents, size, new, extra):
+        return append_extents(extents, new)
+
+    def truncated(self, extents, size, new_size):
+        return []
+
+    def release(self, extents):
+        return []
+
+    def read_cost(self, extents, offset):
+        return 1  # O endereço do bloco é calculado a partir do início da extensão
+
+    def mean_read_cost(self, extents, size):
+        return 1.0
+
+    def metadata_bytes(self, extents, size):
+        return 16 * len(extents)  # (início, comprimento) de cada extensão
+
+    def copy(self):
+        return self
+
+class LinkedEngine:
+    """Alocação encadeada com tabela FAT: cada bloco aponta para o próximo bloco do arquivo."""
+    name = "linked"
+    FREE = -1
+    END = -2
+
+    def __init__(self, size, block_size):
+        self.fat = array.array("i", [self.FREE]) * size
+
+    def find(self, disk, size):
+        return gather_free(disk.free_extents, size) if disk.free_count >= size else None
+
+    def scanned(self, disk, extents):
+        return len(extents) if extents else 0
+
+    def allocated(self, extents, size):
+        fat = self.fat
+        previous = None
+        for start, length in extents:
+            if previous is not None:
+                fat[previous] = start
+            fat[start:start + length - 1] = array.array("i", range(start + 1, start + length))
+            previous = start + length - 1
+        fat[previous] = self.END
+        return extents
+
+    def find_more(self, disk, extents, size, extra):
+        return adjacent_free(disk, extents, extra) or self.find(disk, extra)
+
+    def extended(self, extents, size, new, extra):
+        self.allocated(new, extra)
+        if extents:
+            self.fat[sum(extents[-1]) - 1] = new[0][0]  # O antigo último bloco aponta para o primeiro novo
+        return append_extents(extents, new)
+
+    def truncated(self, extents, size, new_size):
+        if new_size:
+            kept, _ = split_extents(extents, new_size)
+            self.fat[sum(kept[-1]) - 1] = self.END
+        return []  # As entradas da cauda são liberadas por release
+
+    def release(self, extents):
+        for start, length in extents:
+            self.fat[start:start + length] = array.array("i", [self.FREE]) * length
+        return []
+
+    def chain(self, start):
+        """Gera os blocos do arquivo que começa em `start`, seguindo a FAT."""
+        block = start
+        while block != self.END:
+            yield block
+            block = self.fat[block]
+
+    def read_cost(self, extents, offset):
+        # Segue `offset` ponteiros da FAT a partir do primeiro bloco e lê o bloco
+        return sum(1 for _ in itertools.islice(self.chain(extents[0][0]), offset + 1))
+
+    def mean_read_cost(self, extents, size):
+        return (size + 1) / 2
+
+    def metadata_bytes(self, extents, size):
+        return 8 + 4 * size  # Primeiro bloco na entrada do diretório e uma entrada da FAT por bloco
+
+    def copy(self):
+        clone = LinkedEngine(0, 0)
+        clone.fat = array.array("i", self.fat)
+        return clone
+
+class IndexedEngine:
+    """Alocação indexada: blocos de índice encadeados guardam os ponteiros para os blocos de dados."""
+    name = "indexed"
+
+    def __init__(self, size, block_size):
+        self.block_size = block_size
+        self.pointers = block_size // 4 - 1  # Ponteiros de 4 bytes por bloco de índice, além do próximo
+        self.index = {}  # Primeiro bloco de dados -> extensões dos blocos de índice do arquivo
+
+    def index_blocks(self, size):
+        return -(-size // self.pointers)
+
+    def find(self, disk, size):
+        total = size + self.index_blocks(size)
+        return gather_free(disk.free_extents, total) if disk.free_count >= total else None
+
+    def scanned(self, disk, extents):
+        return len(extents) if extents else 0
+
+    def allocated(self, extents, size):
+        # Os primeiros blocos obtidos guardam o índice; os demais, os dados
+        index, data = split_extents(extents, self.index_blocks(size))
+        self.index[data[0][0]] = index
+        return data
+
+    def find_more(self, disk, extents, size, extra):
+        if not extents:
+            return self.find(disk, extra)
+        total = extra + self.index_blocks(size + extra) - self.index_blocks(size)
+        if disk.free_count < total:
+            return None
+        return adjacent_free(disk, extents, total) or gather_free(disk.free_extents, total)
+
+    def extended(self, extents, size, new, extra):
+        if not extents:
+            return self.allocated(new, extra)
+        # Ao crescer, os dados vêm primeiro (continuando o arquivo) e os novos índices depois
+        data, index = split_extents(new, extra)
+        key = extents[0][0]
+        self.index[key] = self.index[key] + index  # Nova lista: a antiga pode ser de um snapshot
+        return append_extents(extents, data)
+
+    def truncated(self, extents, size, new_size):
+        if not new_size:
+            return []  # release remove o índice inteiro com o primeiro bloco de dados
+        key = extents[0][0]
+        self.index[key], surplus = split_extents(self.index[key], self.index_blocks(new_size))
+        return surplus
+
+    def release(self, extents):
+        index = []
+        for start, _ in extents:
+            index += self.index.pop(start, ())
+        return index
+
+    def read_cost(self, extents, offset):
+        return offset // self.pointers + 2  # Blocos de índice até o ponteiro e o bloco de dados
+
+    def mean_read_cost(self, extents, size):
+        full, rest = divmod(size, self.pointers)
+        return 2 + (self.pointers * full * (full - 1) / 2 + rest * full) / size
+
+    def metadata_bytes(self, extents, size):
+        return 8 + self.block_size * self.index_blocks(size)
+
+    def copy(self):
+        clone = IndexedEngine(0, self.block_size)
+        clone.index = dict(self.index)
+        return clone
+
+# Motores de alocação disponíveis, construídos com (tamanho do disco, tamanho do bloco)
+ALLOCATION_ENGINES = {"contiguous": ContiguousEngine, "linked": LinkedEngine, "indexed": IndexedEngine}
+
+# Estado de um disco capturado por VirtualDisk.snapshot (estruturas compartilhadas)
+DiskState = namedtuple("DiskState", "size block_size blocks free_extents free_count rover data engine")
 
 # Representação do disco virtual
 class VirtualDisk:
-    def __init__(self, size):
+    def __init__(self, size, policy="first", backend="list", block_size=BLOCK_SIZE, image=None,
+                 engine="contiguous"):
+        if policy not in ALLOCATION_POLICIES:
+            raise ValueError(f"Política de alocação desconhecida: {policy}")
+        if backend not in BLOCK_MAP_BACKENDS:
+            raise ValueError(f"Mapa de blocos desconhecido: {backend}")
+        if engine not in ALLOCATION_ENGINES:
+            raise ValueError(f"Motor de alocação desconhecido: {engine}")
+        if image is not None and engine != "contiguous":
+            # O inode da imagem guarda poucas extensões e não há onde persistir FAT ou índices
+            raise ValueError(f"O motor de alocação '{engine}' não é suportado com imagens de disco.")
         self.size = size
-        self.blocks = [0] * size  # 0 = bloco livre, 1 = bloco ocupado
+        self.policy = policy
+        self.rover = 0  # Posição seguinte à última alocação (next-fit)
+        # Protege o mapa de blocos e o índice de extensões livres; reentrante
+        # para que a compactação o segure durante várias realocações
+        self.lock = threading.RLock()
+        self.stats = None  # Instrumentação (Stats), quando ativada
+        # Mapa de blocos e índice compartilhados com um snapshot: copiados na próxima alteração
+        self.shared = False
+        self.engine = ALLOCATION_ENGINES[engine](size, block_size)
+        if image is not None:
+            # Disco de uma imagem: o mapa de bits vem da imagem e o índice de
+            # extensões livres só é construído quando for usado pela primeira vez
+            self.blocks = Bitmap(size, image.read_bitmap())
+            self.blocks.dirty = set()
+            self.device = BlockDevice(size, image.block_size, image.mm, image.data_offset)
+            self._free_extents = None
+            self.free_count = image.free_blocks
+            return
+        self.blocks = BLOCK_MAP_BACKENDS[backend](size)  # 0 = bloco livre, 1 = bloco ocupado
+        self.device = BlockDevice(size, block_size)
+        self._free_extents = FreeExtentIndex(size)
+        self.free_count = size  # Mantido por allocate/free; evita varrer o disco
 
+    @property
+    def free_extents(self):
+        if self._free_extents is None:
+            self._free_extents = FreeExtentIndex.from_runs(self.blocks.free_runs(), self.size)
+        return self._free_extents
+
+    def _find(self, size):
+        # Nenhuma extensão é grande o bastante: falha sem percorrer o índice
+        if self.free_extents.largest() < size:
+            return None
+        if self.policy == "best":
+            return self.free_extents.best_fit(size)
+        if self.policy == "next":
+            return self.free_extents.next_fit(size, self.rover)
+        return self.free_extents.first_fit(size)
+
+    @synchronized
     def allocate(self, size):
-        """Aloca blocos contíguos."""
-        free_blocks = [i for i in range(self.size) if self.blocks[i] == 0]
-        if len(free_blocks) < size:
+        """Aloca `size` blocos com o motor de alocação (contíguos, no motor padrão).
+
+        Retorna a lista de extensões (início, comprimento) alocadas, ou None
+        se não houver espaço.
+        """
+        if size < 0:
+            return None
+        if size == 0:
+            return []
+
+        extents = self.engine.find(self, size)
+        if self.stats is not None:
+            self.stats.record_allocation(self.engine.scanned(self, extents), extents is not None)
+        if extents is None:
             return None  # Espaço insuficiente
+        for start, length in extents:
+            self._take(start, length)
+        return self.engine.allocated(extents, size)
+
+    def extents_scanned(self, start):
+        """Quantas extensões livres a política examinou até escolher `start`.
+
+        Calculado a partir da posição de `start` no índice, sem contar nada
+        durante a busca; uma falha é detectada pela maior extensão, sem varredura.
+        """
+        if start is None:
+            return 0
+        index = self.free_extents
+        if self.policy == "best":
+            return max(1, len(index).bit_length())  # Passos da busca binária
+        position = bisect.bisect_left(index.starts, start)
+        if self.policy == "next":
+            position = (position - index.rover_position(self.rover)) % len(index)
+        return position + 1
+
+    @synchronized
+    def allocate_at(self, start, size):
+        """Aloca exatamente a extensão [start, start + size), se estiver livre."""
+        if size <= 0 or not self.free_extents.covers(start, size):
+            return None
+        return self._take(start, size)
+
+    def _take(self, start, size):
+        if self.shared:
+            self._unshare()
+        self.free_extents.take(start, size)
+        self.blocks.set_range(start, size, 1)
+        self.free_count -= size
+        self.rover = start + size
+        return [(start, size)]
+
+    @synchronized
+    def free(self, extents):
+        """Libera as extensões (início, comprimento) especificadas, em O(extensões).
 
-        allocated_blocks = free_blocks[:size]
-        for block in allocated_blocks:
-            self.blocks[block] = 1
-        return allocated_blocks
+        Os blocos de metadados do arquivo (índices), se houver, também são liberados.
+        """
+        if self.shared:
+            self._unshare()
+        # O índice (construído sob demanda numa imagem recém-montada) é lido
+        # antes de o mapa de bits mudar, para não ver as extensões duas vezes
+        index = self.free_extents
+        for start, length in [*extents, *self.engine.release(extents)]:
+            index.insert(start, length)
+            self.blocks.set_range(start, length, 0)
+            self.free_count += length
 
-    def free(self, blocks):
-        """Libera blocos especificados."""
-        for block in blocks:
-            if block < self.size:
-                self.blocks[block] = 0
+    @synchronized
+    def extend(self, extents, size, extra):
+        """Acrescenta `extra` blocos ao fim de um arquivo de `size` blocos com estas extensões.
+
+        Os blocos logo após o fim do arquivo são usados quando estão livres
+        (crescimento no lugar); senão, o motor escolhe outros. Retorna as novas
+        extensões do arquivo, ou None se o motor não puder estendê-lo.
+        """
+        new = self.engine.find_more(self, extents, size, extra)
+        if self.stats is not None:
+            self.stats.record_allocation(self.engine.scanned(self, new), new is not None)
+        if new is None:
+            return None
+        for start, length in new:
+            self._take(start, length)
+        return self.engine.extended(extents, size, new, extra)
+
+    @synchronized
+    def shrink(self, extents, size, new_size):
+        """Libera os blocos de um arquivo além dos `new_size` primeiros.
+
+        Retorna (extensões mantidas, extensões de dados liberadas).
+        """
+        if self.shared:
+            self._unshare()
+        kept, tail = split_extents(extents, new_size)
+        self.free(tail + self.engine.truncated(extents, size, new_size))
+        return kept, tail
+
+    @synchronized
+    def allocate_largest(self, size):
+        """Aloca `size` blocos contíguos no início da maior extensão livre, se couberem."""
+        if size <= 0 or self.free_extents.largest() < size:
+            return None
+        return self._take(self.free_extents.by_size[-1][1], size)
+
+    @synchronized
+    def allocate_batch(self, sizes):
+        """Atende vários pedidos de alocação, atualizando o mapa de blocos uma única vez.
+
+        Retorna, para cada tamanho, a lista de extensões alocadas ou None.
+        """
+        if self.shared:
+            self._unshare()
+        results = []
+        taken = []
+        for size in sizes:
+            if size <= 0:
+                results.append([] if size == 0 else None)
+                continue
+            extents = self.engine.find(self, size)
+            if self.stats is not None:
+                self.stats.record_allocation(self.engine.scanned(self, extents), extents is not None)
+            if extents is None:
+                results.append(None)
+                continue
+            for start, length in extents:
+                self.free_extents.take(start, length)
+                self.free_count -= length
+                self.rover = start + length
+            taken += extents
+            results.append(self.engine.allocated(extents, size))
+        self.blocks.set_extents(taken, 1)
+        return results
+
+    @synchronized
+    def free_batch(self, extents):
+        """Libera um lote de extensões; as adjacentes são fundidas antes de irem ao índice."""
+        if self.shared:
+            self._unshare()
+        merged = coalesce_extents([*extents, *self.engine.release(extents)])
+        for start, length in merged:
+            self.free_extents.insert(start, length)
+            self.free_count += length
+        self.blocks.set_extents(merged, 0)
+
+    @synchronized
+    def snapshot(self):
+        """Captura o estado do disco em O(1): nada é copiado até a próxima alteração."""
+        self.shared = True
+        return DiskState(self.size, self.device.block_size, self.blocks, self.free_extents,
+                         self.free_count, self.rover, self.device.snapshot(), self.engine)
+
+    @synchronized
+    def restore(self, state):
+        """Volta ao estado capturado por `snapshot`, em O(1), compartilhando suas estruturas."""
+        self.size, self.blocks, self._free_extents = state.size, state.blocks, state.free_extents
+        self.free_count, self.rover, self.engine = state.free_count, state.rover, state.engine
+        self.device.restore(state.size, state.block_size, state.data)
+        self.shared = True
+
+    def _unshare(self):
+        # Primeira alteração desde o snapshot: o mapa e o índice passam a ser só deste disco
+        self.blocks = self.blocks.copy()
+        self._free_extents = self.free_extents.copy()
+        self.engine = self.engine.copy()
+        self.shared = False
 
     def get_free_space(self):
-        return self.blocks.count(0)
+        return self.free_count
+
+    @synchronized
+    def largest_free_run(self):
+        return self.free_extents.largest()
+
+    @synchronized
+    def free_extent_count(self):
+        return len(self.free_extents)
 
-# Representação de diretórios e arquivos
+    @synchronized
+    def fragmentation(self):
+        """Fração do espaço livre fora da maior extensão livre (0 = sem fragmentação)."""
+        if self.free_count == 0:
+            return 0.0
+        return 1 - self.largest_free_run() / self.free_count
+
+    def free_runs(self):
+        """Extensões livres lidas diretamente do mapa de blocos."""
+        return self.blocks.free_runs()
+
+# Formato da imagem de disco persistente:
+# [superbloco | mapa de bits | tabela de inodes | blocos de dados],
+# cada região começando em um múltiplo de PAGE_SIZE
+IMAGE_MAGIC = b"SSAFIMG1"
+IMAGE_VERSION = 1
+SUPERBLOCK = struct.Struct("<8sIIQQQQIIQQQ")
+INODE = struct.Struct("<BBHIIIIIQQ8Q128s")
+INODE_SIZE = 256       # Bytes reservados por inode (PAGE_SIZE é múltiplo)
+INODE_EXTENTS = 4      # Extensões (início, comprimento) guardadas no inode
+NAME_MAX = 128         # Bytes do nome, em UTF-8
+ROOT_INODE = 1         # Inodes são numerados a partir de 1; 0 = nenhum
+KIND_FREE, KIND_FILE, KIND_DIR = 0, 1, 2
+
+# Inode decodificado; os diretórios encadeiam seus filhos em uma lista
+# duplamente ligada (first_child/last_child, next_sibling/prev_sibling)
+InodeRecord = namedtuple(
+    "InodeRecord",
+    "kind name parent first_child last_child next_sibling prev_sibling size length extents",
+)
+
+def page_align(offset):
+    return -(-offset // PAGE_SIZE) * PAGE_SIZE
+
+# Journal de escrita antecipada (write-ahead) dos metadados da imagem.
+# Cada transação grava imagens completas das páginas alteradas seguidas de
+# um registro de commit com o número de páginas e o CRC32 delas; só
+# transações com commit íntegro são reaplicadas na recuperação.
+JOURNAL_RECORD = struct.Struct("<4sQ")  # Tipo, página (PAGE) ou transação (CMIT)
+JOURNAL_COMMIT = struct.Struct("<II")   # Páginas da transação, CRC32
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        self.transaction = 0
+        self.commits = 0
+        self.fsyncs = 0
+
+    def append(self, pages):
+        """Grava uma transação (página -> bytes) e força sua gravação com um fsync."""
+        checksum = 0
+        for page, data in sorted(pages.items()):
+            self.file.write(JOURNAL_RECORD.pack(b"PAGE", page))
+            self.file.write(data)
+            checksum = zlib.crc32(data, checksum)
+        self.transaction += 1
+        self.file.write(JOURNAL_RECORD.pack(b"CMIT", self.transaction))
+        self.file.write(JOURNAL_COMMIT.pack(len(pages), checksum))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.commits += 1
+        self.fsyncs += 1
+
+    def size(self):
+        return self.file.tell()
+
+    def reset(self):
+        """Esvazia o journal depois que as páginas chegaram à imagem (checkpoint)."""
+        self.file.truncate(0)
+        self.file.seek(0)
+        os.fsync(self.file.fileno())
+        self.fsyncs += 1
+
+    @staticmethod
+    def transactions(path):
+        """Gera as transações completas do journal, como listas (página, bytes)."""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            pages, checksum = [], 0
+            while True:
+                header = f.read(JOURNAL_RECORD.size)
+                if len(header) < JOURNAL_RECORD.size:
+                    return
+                kind, value = JOURNAL_RECORD.unpack(header)
+                if kind == b"PAGE":
+                    data = f.read(PAGE_SIZE)
+                    if len(data) < PAGE_SIZE:
+                        return  # Transação interrompida no meio
+                    pages.append((value, data))
+                    checksum = zlib.crc32(data, checksum)
+                elif kind == b"CMIT":
+                    tail = f.read(JOURNAL_COMMIT.size)
+                    if len(tail) < JOURNAL_COMMIT.size or JOURNAL_COMMIT.unpack(tail) != (len(pages), checksum):
+                        return
+                    yield pages
+                    pages, checksum = [], 0
+                else:
+                    return
+
+    def close(self):
+        self.file.close()
+
+# Imagem de disco persistente, acessada via mmap
+class DiskImage:
+    # Tamanho do journal que força um checkpoint automático
+    CHECKPOINT_SIZE = 1024 * (JOURNAL_RECORD.size + PAGE_SIZE)
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "r+b")
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.recovered = self.recover()
+        (magic, version, self.block_size, self.disk_size, self.max_inodes, self.inode_count,
+         self.free_blocks, self.root, self.free_inode, self.bitmap_offset, self.inode_offset,
+         self.data_offset) = SUPERBLOCK.unpack_from(self.mm, 0)
+        if magic != IMAGE_MAGIC or version != IMAGE_VERSION:
+            self.close()
+            raise ValueError(f"Imagem de disco inválida: {path}")
+        self.staged = {}      # Página -> bytearray com metadados ainda não registrados no journal
+        self.unsynced = set()  # Páginas do mmap alteradas desde o último checkpoint
+        self.journal = Journal(path + ".journal")
+        self.lock = threading.RLock()
+
+    def recover(self):
+        """Reaplica na imagem as transações completas do journal (replay na montagem).
+
+        Retorna o número de transações reaplicadas.
+        """
+        journal_path = self.path + ".journal"
+        count = 0
+        for pages in Journal.transactions(journal_path):
+            for page, data in pages:
+                self.mm[page * PAGE_SIZE:(page + 1) * PAGE_SIZE] = data
+            count += 1
+        if count:
+            self.mm.flush()
+        if os.path.exists(journal_path):
+            os.truncate(journal_path, 0)
+        return count
+
+    @classmethod
+    def create(cls, path, disk_size, block_size=BLOCK_SIZE, max_inodes=None):
+        """Formata uma nova imagem com o diretório raiz vazio."""
+        max_inodes = max_inodes or max(disk_size, 1024)
+        bitmap = Bitmap(disk_size)
+        bitmap_offset = PAGE_SIZE
+        inode_offset = bitmap_offset + page_align(len(bitmap.bits))
+        data_offset = inode_offset + page_align(max_inodes * INODE_SIZE)
+        if os.path.exists(path + ".journal"):
+            os.remove(path + ".journal")
+        with open(path, "wb") as f:
+            f.truncate(data_offset + disk_size * block_size)  # Arquivo esparso
+            f.write(SUPERBLOCK.pack(
+                IMAGE_MAGIC, IMAGE_VERSION, block_size, disk_size, max_inodes, 0,
+                disk_size, ROOT_INODE, 0, bitmap_offset, inode_offset, data_offset,
+            ))
+            f.seek(bitmap_offset)
+            f.write(bitmap.bits)
+        image = cls(path)
+        image.inode_count = ROOT_INODE
+        image.write_inode(ROOT_INODE, InodeRecord(KIND_DIR, "RAIZ", 0, 0, 0, 0, 0, 0, 0, ()))
+        return image
+
+    def close(self):
+        if hasattr(self, "journal"):
+            self.journal.close()
+        self.mm.close()
+        self.file.close()
+
+    # Acesso paginado: leituras consultam primeiro as páginas preparadas
+    def _read(self, offset, size):
+        page, start = divmod(offset, PAGE_SIZE)
+        buffer = self.staged.get(page)
+        if buffer is None:
+            return self.mm[offset:offset + size]
+        return bytes(buffer[start:start + size])
+
+    def _write(self, offset, data):
+        page, start = divmod(offset, PAGE_SIZE)
+        buffer = self.staged.get(page)
+        if buffer is None:
+            buffer = self.staged[page] = bytearray(self.mm[page * PAGE_SIZE:(page + 1) * PAGE_SIZE])
+        buffer[start:start + len(data)] = data
+
+    def read_bitmap(self):
+        return self.mm[self.bitmap_offset:self.bitmap_offset + (self.disk_size + 63) // 64 * 8]
+
+    def name_fits(self, name):
+        return len(name.encode()) <= NAME_MAX
+
+    def read_inode(self, ino):
+        fields = INODE.unpack(self._read(self.inode_offset + (ino - 1) * INODE_SIZE, INODE.size))
+        kind, name_len, extent_count = fields[:3]
+        pairs = fields[10:18]
+        extents = tuple((pairs[2 * i], pairs[2 * i + 1]) for i in range(extent_count))
+        name = fields[18][:name_len].decode()
+        return InodeRecord(kind, name, *fields[3:10], extents)
+
+    def write_inode(self, ino, record):
+        name = record.name.encode()
+        pairs = [value for extent in record.extents for value in extent]
+        pairs += [0] * (2 * INODE_EXTENTS - len(pairs))
+        self._write(self.inode_offset + (ino - 1) * INODE_SIZE, INODE.pack(
+            record.kind, len(name), len(record.extents), record.parent, record.first_child,
+            record.last_child, record.next_sibling, record.prev_sibling, record.size,
+            record.length, *pairs, name,
+        ))
+
+    @synchronized
+    def update_inode(self, ino, **fields):
+        self.write_inode(ino, self.read_inode(ino)._replace(**fields))
+
+    @synchronized
+    def link(self, parent, kind, name, size=0, extents=(), length=0):
+        """Cria um inode e o anexa ao fim da lista de filhos de `parent`.
+
+        Retorna o número do inode, ou None se a tabela de inodes estiver cheia.
+        """
+        if self.free_inode:
+            ino = self.free_inode
+            self.free_inode = self.read_inode(ino).next_sibling
+        elif self.inode_count < self.max_inodes:
+            self.inode_count += 1
+            ino = self.inode_count
+        else:
+            return None
+
+        self._attach(ino, InodeRecord(kind, name, parent, 0, 0, 0, 0, size, length, tuple(extents)))
+        return ino
+
+    def _attach(self, ino, record):
+        # Grava o inode como último filho de record.parent
+        parent = record.parent
+        last = self.read_inode(parent).last_child
+        self.write_inode(ino, record._replace(next_sibling=0, prev_sibling=last))
+        if last:
+            self.update_inode(last, next_sibling=ino)
+            self.update_inode(parent, last_child=ino)
+        else:
+            self.update_inode(parent, first_child=ino, last_child=ino)
+
+    def _detach(self, record):
+        # Retira o inode de `record` da lista de filhos do pai
+        if record.prev_sibling:
+            self.update_inode(record.prev_sibling, next_sibling=record.next_sibling)
+        else:
+            self.update_inode(record.parent, first_child=record.next_sibling)
+        if record.next_sibling:
+            self.update_inode(record.next_sibling, prev_sibling=record.prev_sibling)
+        else:
+            self.update_inode(record.parent, last_child=record.prev_sibling)
+
+    @synchronized
+    def unlink(self, ino):
+        """Remove um inode da lista de filhos do pai e o devolve à lista livre."""
+        self._detach(self.read_inode(ino))
+        self.release([ino])
+
+    @synchronized
+    def release(self, inos):
+        """Devolve inodes à lista livre sem tocar nas listas de filhos.
+
+        Usado para os descendentes de um diretório removido com `unlink`,
+        cujas listas deixam de ser alcançáveis.
+        """
+        for ino in inos:
+            self.write_inode(ino, InodeRecord(KIND_FREE, "", 0, 0, 0, self.free_inode, 0, 0, 0, ()))
+            self.free_inode = ino
+
+    @synchronized
+    def move(self, ino, parent, name):
+        """Move o inode para o fim da lista de filhos de `parent`, com o nome `name`."""
+        record = self.read_inode(ino)
+        self._detach(record)
+        self._attach(ino, record._replace(parent=parent, name=name))
+
+    @synchronized
+    def load_directory(self, directory):
+        """Lê da imagem as entradas de um diretório (chamado no primeiro acesso)."""
+        if directory._contents is not None:
+            return directory._contents  # Já carregado por outra thread
+        contents = {}
+        ino = self.read_inode(directory.ino).first_child
+        while ino:
+            record = self.read_inode(ino)
+            if record.kind == KIND_DIR:
+                contents[record.name] = Directory(record.name, ino, self.load_directory, directory)
+            else:
+                file = File(record.name, record.size, ino, directory)
+                file.length = record.length
+                file.extents = list(record.extents)
+                contents[record.name] = file
+            ino = record.next_sibling
+        return contents
+
+    @synchronized
+    def commit(self, disk):
+        """Registra no journal os metadados alterados (group commit) e os aplica no mmap.
+
+        Todas as operações desde o último commit entram em uma única
+        transação, com um só fsync. Retorna o número de páginas registradas.
+        """
+        bitmap = disk.blocks
+        for page in sorted(bitmap.dirty):
+            start = page * PAGE_SIZE
+            self._write(self.bitmap_offset + start, bitmap.bits[start:start + PAGE_SIZE])
+        bitmap.dirty.clear()
+        self.free_blocks = disk.free_count
+        self._write(0, SUPERBLOCK.pack(
+            IMAGE_MAGIC, IMAGE_VERSION, self.block_size, self.disk_size, self.max_inodes,
+            self.inode_count, self.free_blocks, self.root, self.free_inode,
+            self.bitmap_offset, self.inode_offset, self.data_offset,
+        ))
+        # Regra do write-ahead: as páginas só vão para a imagem depois do fsync do journal
+        self.journal.append(self.staged)
+        for page, buffer in self.staged.items():
+            self.mm[page * PAGE_SIZE:(page + 1) * PAGE_SIZE] = buffer
+        self.unsynced.update(self.staged)
+        count = len(self.staged)
+        self.staged.clear()
+        if self.journal.size() >= self.CHECKPOINT_SIZE:
+            self.checkpoint(disk)
+        return count
+
+    @synchronized
+    def checkpoint(self, disk):
+        """Descarrega na imagem só as páginas sujas e esvazia o journal."""
+        if self.staged or disk.blocks.dirty:
+            self.commit(disk)
+        for block in disk.device.dirty:
+            start = self.data_offset + block * self.block_size
+            self.unsynced.update(range(start // PAGE_SIZE, (start + self.block_size - 1) // PAGE_SIZE + 1))
+        disk.device.dirty.clear()
+        count = len(self.unsynced)
+        self._flush_pages(sorted(self.unsynced))
+        self.unsynced.clear()
+        self.journal.reset()
+        return count
+
+    def _flush_pages(self, pages):
+        # Agrupa páginas consecutivas para descarregá-las com um msync por trecho
+        i = 0
+        while i < len(pages):
+            j = i
+            while j + 1 < len(pages) and pages[j + 1] == pages[j] + 1:
+                j += 1
+            start = pages[i] * PAGE_SIZE
+            self.mm.flush(start, min((j - i + 1) * PAGE_SIZE, len(self.mm) - start))
+            i = j + 1
+
+# Representação de diretórios e arquivos (com __slots__, sem dicionário por
+# instância, para manter milhões de entradas em memória)
 class File:
-    def __init__(self, name, size=0):
+    __slots__ = ("name", "size", "length", "extents", "ino", "parent", "epoch")
+
+    def __init__(self, name, size=0, ino=None, parent=None, epoch=None):
         self.name = name
-        self.size = size
-        self.data = ""
-        self.blocks = []
+        self.size = size      # Em blocos
+        self.length = 0       # Bytes de dados gravados nos blocos
+        self.extents = []     # Extensões (início, comprimento) na ordem lógica do arquivo
+        self.ino = ino        # Inode na imagem de disco (None = só em memória)
+        self.parent = parent
+        self.epoch = epoch    # Época do FileSystem que pode alterá-lo (ver FileSystem.snapshot)
+
+    def fork(self, epoch, parent):
+        """Cópia do arquivo para a época `epoch` (copy-on-write)."""
+        clone = File(self.name, self.size, self.ino, parent, epoch)
+        clone.length = self.length
+        clone.extents = list(self.extents)
+        return clone
+
+    def iter_blocks(self, count=None):
+        """Gera os números dos primeiros `count` blocos do arquivo (todos, por padrão)."""
+        remaining = self.size if count is None else count
+        for start, length in self.extents:
+            if remaining <= 0:
+                return
+            yield from range(start, start + min(length, remaining))
+            remaining -= length
 
 class Directory:
-    def __init__(self, name):
+    __slots__ = ("name", "ino", "parent", "loader", "_contents", "epoch")
+
+    def __init__(self, name, ino=None, loader=None, parent=None, epoch=None):
         self.name = name
-        self.contents = {}  # Nome -> (Diretório ou Arquivo)
+        self.ino = ino
+        self.parent = parent  # None apenas na raiz
+        # Diretórios de uma imagem montada carregam o conteúdo no primeiro acesso
+        self.loader = loader
+        self._contents = None if loader else {}  # Nome -> (Diretório ou Arquivo)
+        self.epoch = epoch
+
+    def fork(self, epoch, parent):
+        """Cópia do diretório para a época `epoch`; as entradas continuam compartilhadas."""
+        clone = Directory(self.name, self.ino, parent=parent, epoch=epoch)
+        clone._contents = dict(self.contents)
+        return clone
+
+    @property
+    def contents(self):
+        if self._contents is None:
+            self._contents = self.loader(self)
+        return self._contents
+
+# Cache de resolução de caminhos (dentry cache): caminho absoluto -> objeto.
+# Entradas negativas (None) registram caminhos que não existem.
+class DentryCache:
+    MISSING = object()
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Incrementada a cada invalidação: uma resolução que começou antes dela
+        # não pode guardar seu resultado (que talvez já esteja obsoleto)
+        self.generation = 0
+        self.lock = threading.RLock()
+
+    @synchronized
+    def get(self, path):
+        obj = self.entries.get(path, self.MISSING)
+        if obj is self.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(path)
+        return obj
+
+    @synchronized
+    def put(self, path, obj, generation=None):
+        if generation is not None and generation != self.generation:
+            return
+        self.entries[path] = obj
+        self.entries.move_to_end(path)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    @synchronized
+    def invalidate(self, path, subtree=False):
+        """Descarta a entrada de `path` e, com `subtree`, as de seus descendentes."""
+        self.generation += 1
+        self.entries.pop(path, None)
+        if subtree:
+            prefix = path + "/"
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    @synchronized
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+# Índice global de nomes: nome -> caminhos absolutos das entradas com esse
+# nome. Os nomes distintos ficam também em uma lista ordenada, para que um
+# glob com prefixo literal (`log*`) seja resolvido por busca binária.
+class NameIndex:
+    def __init__(self):
+        self.paths = {}  # Nome -> conjunto de caminhos absolutos
+        self.names = []  # Nomes distintos, em ordem
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return sum(len(paths) for paths in self.paths.values())
+
+    @synchronized
+    def add(self, name, path):
+        paths = self.paths.get(name)
+        if paths is None:
+            paths = self.paths[name] = set()
+            bisect.insort(self.names, name)
+        paths.add(path)
+
+    @synchronized
+    def discard(self, name, path):
+        paths = self.paths.get(name)
+        if paths is None:
+            return
+        paths.discard(path)
+        if not paths:
+            del self.paths[name]
+            del self.names[bisect.bisect_left(self.names, name)]
+
+    @synchronized
+    def match(self, pattern, regex=False):
+        """Caminhos das entradas cujo nome inteiro casa com `pattern` (glob ou expressão regular).
+
+        Um nome exato custa O(1); um glob, só os nomes com o seu prefixo
+        literal; uma expressão regular (ou um glob sem prefixo) examina cada
+        nome distinto uma vez. Levanta re.error se a expressão for inválida.
+        """
+        if regex:
+            expression = re.compile(pattern)
+            names = [name for name in self.names if expression.fullmatch(name)]
+        else:
+            prefix = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+            if prefix == pattern:
+                names = [pattern] if pattern in self.paths else []
+            else:
+                candidates = itertools.takewhile(
+                    lambda name: name.startswith(prefix),
+                    itertools.islice(self.names, bisect.bisect_left(self.names, prefix), None))
+                names = [name for name in candidates if fnmatch.fnmatchcase(name, pattern)]
+        return [path for name in names for path in self.paths[name]]
+
+# Registro estruturado do log; os detalhes só são formatados quando exibidos
+class LogRecord(namedtuple("LogRecord", "op args status details detail_args timestamp duration")):
+    __slots__ = ()
+
+    def render_details(self):
+        return self.details.format(*self.detail_args) if self.detail_args else self.details
+
+    def render(self):
+        command = " ".join([self.op, *map(str, self.args)])
+        return f"Comando: {command}\nResultado: {self.status}\nDetalhes: {self.render_details()}\n"
+
+    def to_dict(self):
+        return {
+            "timestamp": self.timestamp,
+            "op": self.op,
+            "args": [str(arg) for arg in self.args],
+            "status": self.status,
+            "details": self.render_details(),
+            "duration": self.duration,
+        }
+
+# Gravador de log em segundo plano: grava os registros em JSON lines
+class LogWriter:
+    def __init__(self, path, max_pending=10000):
+        self.file = open(path, "a", encoding="utf-8")
+        self.pending = queue.Queue(max_pending)  # Cheia = bloqueia quem registra
+        self.bytes_written = 0
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, record):
+        self.pending.put(record)
+
+    def _run(self):
+        while True:
+            records = [self.pending.get()]
+            # Agrupa tudo o que já estiver na fila em uma única escrita
+            while True:
+                try:
+                    records.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            stop = records[-1] is None
+            lines = "".join(json.dumps(record.to_dict(), ensure_ascii=False) + "\n"
+                            for record in records if record is not None)
+            self.file.write(lines)
+            self.file.flush()
+            self.bytes_written += len(lines.encode("utf-8"))
+            if stop:
+                return
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        self.file.close()
+
+# Trace de comandos em JSON lines: a primeira linha é um cabeçalho com o
+# formato e a configuração do disco; cada linha seguinte é um comando, com
+# "c" (texto), "t" (ns desde o início), e opcionalmente "d" (duração
+# original, em ns) e "s" (sessão que o executou)
+TRACE_FORMAT = "ssa-trace"
+TRACE_VERSION = 1
+
+class TraceWriter:
+    def __init__(self, path, **header):
+        self.file = open(path, "w", encoding="utf-8")
+        header = {"format": TRACE_FORMAT, "version": TRACE_VERSION, "created": time.time(), **header}
+        self.file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        self.start = time.perf_counter_ns()
+        self.count = 0
+
+    def record(self, command, duration_ns=None, session=None):
+        entry = {"t": time.perf_counter_ns() - self.start, "c": command}
+        if duration_ns is not None:
+            entry["d"] = duration_ns
+        if session is not None:
+            entry["s"] = session
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_trace(path):
+    """Abre um trace; retorna (cabeçalho, gerador de registros).
+
+    Os registros são lidos do arquivo sob demanda, sem carregar o trace inteiro.
+    """
+    file = open(path, encoding="utf-8")
+    header = json.loads(file.readline() or "{}")
+    if header.get("format") != TRACE_FORMAT or header.get("version") != TRACE_VERSION:
+        file.close()
+        raise ValueError(f"Trace inválido: {path}")
+
+    def records():
+        with file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    return header, records()
+
+# Instrumentação opcional (FileSystem.enable_stats): desativada, o custo é
+# apenas o teste `stats is not None` em cada comando e alocação
+class Stats:
+    HISTOGRAM_BUCKETS = 64  # Balde b: durações de 2**(b-1) a 2**b ns
+
+    def __init__(self, exporter=None, export_interval=1000):
+        self.lock = threading.Lock()
+        self.commands = {}  # Comando -> [chamadas, erros, tempo total (ns), histograma]
+        self.calls = 0
+        self.allocations = 0
+        self.failed_allocations = 0
+        self.extents_scanned = 0
+        self.log_records = 0
+        # `exporter` recebe o resumo (snapshot) a cada `export_interval` comandos
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.source = None  # FileSystem que fornece os contadores dos caches e do log
+
+    def record(self, command, duration_ns, error):
+        with self.lock:
+            entry = self.commands.get(command)
+            if entry is None:
+                entry = self.commands[command] = [0, 0, 0, [0] * self.HISTOGRAM_BUCKETS]
+            entry[0] += 1
+            entry[1] += error
+            entry[2] += duration_ns
+            entry[3][min(duration_ns.bit_length(), self.HISTOGRAM_BUCKETS - 1)] += 1
+            self.calls += 1
+            export = self.exporter is not None and self.calls % self.export_interval == 0
+        if export:
+            self.exporter(self.snapshot())
+
+    def record_allocation(self, scanned, success):
+        with self.lock:
+            self.allocations += 1
+            self.failed_allocations += not success
+            self.extents_scanned += scanned
+
+    def record_log(self):
+        with self.lock:
+            self.log_records += 1
+
+    @staticmethod
+    def histogram_percentile(histogram, fraction):
+        """Limite superior (ns) do balde que contém o percentil `fraction`."""
+        target = fraction * sum(histogram)
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return 2 ** bucket
+        return 0
+
+    def snapshot(self):
+        """Resumo dos contadores em um dicionário (serializável em JSON)."""
+        with self.lock:
+            commands = {
+                name: {
+                    "calls": calls,
+                    "errors": errors,
+                    "total_ns": total,
+                    "mean_ns": total // calls,
+                    "p50_ns": self.histogram_percentile(histogram, 0.50),
+                    "p99_ns": self.histogram_percentile(histogram, 0.99),
+                    "histogram": {2 ** b: n for b, n in enumerate(histogram) if n},
+                }
+                for name, (calls, errors, total, histogram) in self.commands.items()
+            }
+            allocations = {
+                "calls": self.allocations,
+                "failed": self.failed_allocations,
+                "extents_scanned": self.extents_scanned,
+                "mean_extents_scanned": self.extents_scanned / self.allocations if self.allocations else 0.0,
+            }
+        snapshot = {"timestamp": time.time(), "commands": commands, "allocations": allocations}
+        fs = self.source
+        if fs is not None:
+            snapshot["page_cache"] = {"hits": fs.cache.hits, "misses": fs.cache.misses,
+                                      "hit_rate": fs.cache.hit_rate()}
+            dentry_total = fs.dentries.hits + fs.dentries.misses
+            snapshot["dentry_cache"] = {"hits": fs.dentries.hits, "misses": fs.dentries.misses,
+                                        "hit_rate": fs.dentries.hits / dentry_total if dentry_total else 0.0}
+            snapshot["device"] = {"reads": fs.disk.device.reads, "writes": fs.disk.device.writes}
+            snapshot["log"] = {"records": self.log_records, "retained": len(fs.log),
+                               "bytes_written": fs.log_writer.bytes_written if fs.log_writer else 0}
+        return snapshot
+
+    def format(self):
+        """Relatório em texto do comando `stats`."""
+        snapshot = self.snapshot()
+        lines = [f"{'Comando':<12} {'Chamadas':>9} {'Erros':>6} {'Média (µs)':>11} {'p50 (µs)':>9} {'p99 (µs)':>9}"]
+        for name, c in sorted(snapshot["commands"].items()):
+            lines.append(f"{name:<12} {c['calls']:>9} {c['errors']:>6} {c['mean_ns'] / 1000:>11.1f} "
+                         f"{c['p50_ns'] / 1000:>9.1f} {c['p99_ns'] / 1000:>9.1f}")
+        a = snapshot["allocations"]
+        lines.append(f"Alocações: {a['calls']}, Falhas: {a['failed']}, "
+                     f"Extensões examinadas por alocação: {a['mean_extents_scanned']:.2f}")
+        if "page_cache" in snapshot:
+            lines.append(f"Cache de páginas: {snapshot['page_cache']['hit_rate']:.1%} de acertos, "
+                         f"Dentry cache: {snapshot['dentry_cache']['hit_rate']:.1%} de acertos")
+            lines.append(f"Log: {snapshot['log']['records']} registros, "
+                         f"{snapshot['log']['bytes_written']} bytes gravados")
+        return "\n".join(lines)
+
+def export_stats_jsonl(path):
+    """Cria um exportador que acrescenta cada resumo como uma linha JSON em `path`."""
+    def exporter(snapshot):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot) + "\n")
+    return exporter
+
+def operation(method):
+    """Marca o início de um comando para que seu registro de log tenha a duração."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        local = self.local  # O início é guardado por thread
+        outer = local.op_start
+        local.op_start = start = time.perf_counter_ns()
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            local.op_start = outer
+        if self.stats is not None:
+            self.stats.record(name, time.perf_counter_ns() - start, result.startswith("Erro"))
+        return result
+    return wrapper
+
+# Estado de cada thread: sessão ativa (None = sessão padrão) e início do
+# comando em execução
+class ThreadState(threading.local):
+    session = None
+    op_start = None
+
+# Sessão de um cliente: cada uma tem seu próprio diretório atual
+class Session:
+    __slots__ = ("current_dir", "path", "version", "__weakref__")
+
+    def __init__(self, root, version=0):
+        self.current_dir = root
+        self.path = f"/{root.name}"
+        self.version = version  # FileSystem.tree_version em que current_dir foi resolvido
+
+# Estado de um FileSystem capturado por FileSystem.snapshot
+# (raiz, estado do disco e caminho atual da sessão que o capturou)
+Snapshot = namedtuple("Snapshot", "root disk path")
+
+# Resultado de um comando executado em lote
+CommandResult = namedtuple("CommandResult", "command status output")
+
+# Conversores dos argumentos de cada comando (texto após o nome do comando)
+def parse_no_args(rest):
+    if rest:
+        raise ValueError("argumentos inesperados")
+    return ()
+
+def parse_one_arg(rest):
+    if not rest:
+        raise ValueError("argumento ausente")
+    return (rest,)
+
+def parse_count(text, what):
+    """Converte `text` em um inteiro não negativo; `what` nomeia o valor na mensagem de erro."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(f"{what} deve ser um número inteiro") from None
+    if value < 0:
+        raise ValueError(f"{what} não pode ser negativo")
+    return value
+
+def parse_create(rest):
+    parts = rest.split()
+    if len(parts) != 2:
+        raise ValueError("esperados um nome e um tamanho em blocos")
+    return parts[0], parse_count(parts[1], "o tamanho")
+
+def parse_write(rest):
+    parts = rest.split(maxsplit=1)
+    if len(parts) != 2:
+        raise ValueError("esperados um caminho e os dados")
+    return tuple(parts)
+
+def parse_truncate(rest):
+    path, _, length = rest.partition(" ")
+    return parse_one_arg(path) + ((parse_count(length, "o tamanho em bytes"),) if length else ())
+
+def parse_rm(rest):
+    flag, _, path = rest.partition(" ")
+    if flag != "-r":
+        return parse_one_arg(rest)
+    return parse_one_arg(path.strip()) + (True,)
+
+def parse_two_args(rest):
+    parts = rest.split()
+    if len(parts) != 2:
+        raise ValueError("esperados uma origem e um destino")
+    return tuple(parts)
+
+def parse_optional_arg(rest):
+    return (rest,) if rest else ()
+
+def parse_optional_int(rest):
+    return (parse_count(rest, "o limite de blocos"),) if rest else ()
+
+def parse_tree(rest):
+    return (None, "", parse_count(rest, "a profundidade")) if rest else ()
+
+def parse_ls(rest):
+    # ls [-sort] [-offset N] [-limit N]
+    tokens = rest.split()
+    sort, offset, limit = False, 0, None
+    while tokens:
+        option = tokens.pop(0)
+        if option == "-sort":
+            sort = True
+        elif option in ("-offset", "-limit") and tokens:
+            value = parse_count(tokens.pop(0), f"o valor de {option}")
+            if option == "-offset":
+                offset = value
+            else:
+                limit = value
+        elif option in ("-offset", "-limit"):
+            raise ValueError("opção sem valor")
+        else:
+            raise ValueError(f"opção inválida: {option}")
+    return sort, offset, limit
+
+def parse_find(rest):
+    # find [caminho] [-name glob | -regex expressão] [-size [+|-]N] [-sort name|size]
+    tokens = rest.split()
+    path = tokens.pop(0) if tokens and not tokens[0].startswith("-") else None
+    if len(tokens) % 2:
+        raise ValueError("opção sem valor")
+    pattern, regex, min_size, max_size, sort = "*", False, None, None, "name"
+    for option, value in zip(tokens[::2], tokens[1::2]):
+        if option in ("-name", "-regex"):
+            pattern, regex = value, option == "-regex"
+        elif option == "-size":
+            # Como no find do Unix: +N = mais de N blocos, -N = menos de N, N = exatamente N
+            size = parse_count(value.lstrip("+-"), "o tamanho")
+            if value.startswith("+"):
+                min_size = size + 1
+            elif value.startswith("-"):
+                max_size = size - 1
+            else:
+                min_size = max_size = size
+        elif option == "-sort" and value in ("name", "size"):
+            sort = value
+        else:
+            raise ValueError(f"opção inválida: {option} {value}")
+    return path, pattern, regex, min_size, max_size, sort
+
+# Tabela de despacho: comando -> (método de FileSystem, conversor de argumentos)
+COMMANDS = {
+    "mkdir": ("mkdir", parse_one_arg),
+    "create": ("create_file", parse_create),
+    "ls": ("ls", parse_ls),
+    "cd": ("cd", parse_one_arg),
+    "delete": ("delete", parse_one_arg),
+    "rm": ("remove", parse_rm),
+    "cp": ("copy", parse_two_args),
+    "mv": ("move", parse_two_args),
+    "info": ("info", parse_no_args),
+    "write": ("write", parse_write),
+    "read": ("read", parse_one_arg),
+    "append": ("append", parse_write),
+    "truncate": ("truncate", parse_truncate),
+    "resize": ("resize", parse_create),
+    "log": ("show_log", parse_no_args),
+    "tree": ("tree", parse_tree),
+    "find": ("find", parse_find),
+    "sync": ("sync", parse_no_args),
+    "defrag": ("defrag", parse_optional_int),
+    "stats": ("show_stats", parse_optional_arg),
+}
 
 # Sistema de Arquivos
+#
+# Ordem de aquisição dos locks (para evitar deadlock): listras de diretórios
+# (em ordem crescente) -> disco (também protege o commit do journal) ->
+# cache de páginas -> imagem -> dentry cache -> índice de nomes.
 class FileSystem:
-    def __init__(self, disk_size):
-        self.disk = VirtualDisk(disk_size)
-        self.root = Directory("RAIZ")
-        self.current_dir = self.root
-        self.path = "/RAIZ"
-        self.log = []
+    DIR_LOCK_STRIPES = 64
+
+    def __init__(self, disk_size, policy="first", backend="list", defrag_budget=None,
+                 block_size=BLOCK_SIZE, cache_size=64, write_back=True, image=None,
+                 dentry_cache_size=1024, log_capacity=1000, log_file=None, commit_interval=64,
+                 engine="contiguous"):
+        # `image` pode ser o caminho de uma nova imagem de disco a formatar
+        if isinstance(image, str):
+            image = DiskImage.create(image, disk_size, block_size)
+        self.image = image
+        if defrag_budget is not None and engine != "contiguous":
+            raise ValueError("A desfragmentação só se aplica à alocação contígua.")
+        self.disk = VirtualDisk(disk_size, policy, backend, block_size, image, engine)
+        self.cache = PageCache(self.disk.device, cache_size, write_back)
+        if image is None:
+            self.root = Directory("RAIZ")
+            self.owners = {}  # Início de extensão -> arquivo que a ocupa
+            self.names = NameIndex()
+        else:
+            self.root = Directory("RAIZ", image.root, image.load_directory)
+            self.owners = None  # Montado sob demanda por owner_map()
+            self.names = None   # Montado sob demanda por name_index()
+        # Operações de metadados agrupadas em cada commit do journal da imagem
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+        self.local = ThreadState()
+        # Época da árvore: só objetos desta época podem ser alterados no lugar;
+        # os demais são compartilhados com snapshots (ver snapshot)
+        self.epoch = None
+        self.tree_version = 0  # Incrementada quando diretórios são trocados por cópias
+        self.default_session = Session(self.root)
+        # Sessões vivas: o diretório atual de qualquer uma delas não pode ser removido nem movido
+        self.sessions = weakref.WeakSet([self.default_session])
+        # Locks dos diretórios, em listras: cada diretório usa o lock de índice
+        # id(diretório) % DIR_LOCK_STRIPES, sem um lock por objeto
+        self.dir_locks = [threading.RLock() for _ in range(self.DIR_LOCK_STRIPES)]
+        self.dentries = DentryCache(dentry_cache_size)
+        self.log = deque(maxlen=log_capacity)  # Só os registros mais recentes
+        self.log_writer = LogWriter(log_file) if log_file else None
+        self.stats = None  # Instrumentação desativada (ver enable_stats)
+        # Blocos que a desfragmentação incremental pode mover por operação
+        # (None desativa a desfragmentação automática)
+        self.defrag_budget = defrag_budget
+        self.blocks_moved = 0
+        self.blocks_copied = 0  # Blocos copiados ao realocar arquivos que cresceram
+
+    @property
+    def session(self):
+        """Sessão da thread atual (a sessão padrão, se nenhuma foi ativada)."""
+        return self.local.session or self.default_session
+
+    @property
+    def current_dir(self):
+        session = self.session
+        if session.version != self.tree_version:
+            # O diretório da sessão pode ter sido copiado ou restaurado: reencontra-o pelo caminho
+            directory = self.lookup(session.path)
+            if not isinstance(directory, Directory):
+                directory, session.path = self.root, f"/{self.root.name}"
+            session.current_dir = directory
+            session.version = self.tree_version
+        return session.current_dir
+
+    @property
+    def path(self):
+        return self.session.path
+
+    def open_session(self):
+        """Cria uma sessão de cliente, começando na raiz."""
+        session = Session(self.root, self.tree_version)
+        self.sessions.add(session)
+        return session
+
+    @contextlib.contextmanager
+    def using(self, session):
+        """Ativa `session` na thread atual durante o bloco `with`."""
+        outer = self.local.session
+        self.local.session = session
+        try:
+            yield session
+        finally:
+            self.local.session = outer
+
+    def dir_lock(self, directory):
+        """Lock (da listra) que protege o conteúdo de `directory`."""
+        return self.dir_locks[(id(directory) >> 4) % self.DIR_LOCK_STRIPES]
+
+    @contextlib.contextmanager
+    def locked(self, *objects):
+        """Segura, em ordem crescente, os locks dos diretórios em `objects` (todos, se nenhum for dado)."""
+        if objects:
+            stripes = sorted({(id(obj) >> 4) % self.DIR_LOCK_STRIPES for obj in objects})
+        else:
+            stripes = range(self.DIR_LOCK_STRIPES)
+        for i in stripes:
+            self.dir_locks[i].acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(stripes):
+                self.dir_locks[i].release()
+
+    @classmethod
+    def mount(cls, path, **options):
+        """Monta uma imagem de disco existente; os diretórios são lidos sob demanda."""
+        image = DiskImage(path)
+        return cls(image.disk_size, block_size=image.block_size, image=image, **options)
+
+    def unmount(self):
+        self.sync()
+        self.image.close()
+
+    def metadata_changed(self):
+        """Conta uma operação de metadados e faz o group commit a cada `commit_interval`."""
+        if self.image is None:
+            return
+        with self.disk.lock:
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_interval:
+                self.commit()
+
+    def commit(self):
+        with self.disk.lock, self.cache.lock:
+            self.cache.flush()
+            self.uncommitted = 0
+            return self.image.commit(self.disk)
+
+    def link_inode(self, directory, kind, name, size=0, extents=(), length=0):
+        """Registra uma nova entrada de `directory` na imagem de disco.
+
+        Retorna (inode, erro); sem imagem, o inode é None.
+        """
+        if self.image is None:
+            return None, None
+        if not self.image.name_fits(name):
+            return None, "Nome muito longo."
+        ino = self.image.link(directory.ino, kind, name, size, extents, length)
+        if ino is None:
+            return None, "Tabela de inodes cheia."
+        return ino, None
+
+    def snapshot(self):
+        """Captura, em O(1), a árvore, o mapa de blocos e os dados, para `restore` ou `clone`.
+
+        Nada é copiado: o estado passa a ser compartilhado e cada lado copia
+        só o que alterar (copy-on-write), um diretório ou arquivo por vez.
+        Deve ser chamado sem outros comandos em andamento; não é suportado
+        com imagens de disco.
+        """
+        if self.image is not None:
+            raise ValueError("Snapshots não são suportados com imagens de disco.")
+        with self.locked(), self.disk.lock, self.cache.lock:
+            self.cache.flush()
+            snapshot = Snapshot(self.root, self.disk.snapshot(), self.path)
+            self.epoch = object()  # Tudo o que existe agora passa a ser compartilhado
+            self.owners = None     # Remontado (com cópias próprias) pela compactação
+        return snapshot
+
+    def restore(self, snapshot):
+        """Volta ao estado de `snapshot` em O(1), sem copiar a árvore.
+
+        A sessão atual volta ao diretório em que o snapshot foi capturado; as
+        demais ficam no mesmo caminho, se ele existir no snapshot, ou vão à raiz.
+        """
+        if self.image is not None:
+            raise ValueError("Snapshots não são suportados com imagens de disco.")
+        with self.locked(), self.disk.lock, self.cache.lock:
+            self.cache.drop()
+            self.disk.restore(snapshot.disk)
+            self.root = snapshot.root
+            self.epoch = object()
+            self.owners = None
+            self.names = None
+            self.tree_version += 1
+            self.session.path = snapshot.path
+            self.dentries.clear()
+
+    def clone(self, snapshot=None, **options):
+        """Cria um FileSystem que parte deste estado (ou de `snapshot`), em O(1) e copy-on-write.
+
+        `options` são repassadas ao construtor do clone (por exemplo, outra
+        `policy` ou `defrag_budget`); a política padrão é a deste disco. O
+        clone começa no diretório atual de quando o snapshot foi capturado.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        options.setdefault("policy", self.disk.policy)
+        fs = FileSystem(0, block_size=snapshot.disk.block_size, **options)
+        fs.restore(snapshot)
+        return fs
+
+    def allocation_costs(self, samples=1000, seed=0):
+        """Custos da estratégia de alocação sobre os arquivos atuais.
+
+        Retorna o motor, o número de arquivos e de blocos de dados, o custo
+        médio (em acessos ao disco) de ler um bloco aleatório, ponderado
+        pelo tamanho dos arquivos, os bytes de metadados e as extensões por arquivo.
+        O custo de leitura também é medido em `samples` blocos sorteados (com
+        `seed`), seguindo as estruturas do motor (na encadeada, a FAT).
+        """
+        engine = self.disk.engine
+        files = []
+        blocks = extents = metadata = 0
+        read_cost = sampled = 0.0
+        with self.locked():
+            for obj in self.walk(self.root):
+                if not isinstance(obj, File) or obj.size == 0:
+                    continue
+                files.append(obj)
+                blocks += obj.size
+                extents += len(obj.extents)
+                read_cost += engine.mean_read_cost(obj.extents, obj.size) * obj.size
+                metadata += engine.metadata_bytes(obj.extents, obj.size)
+            if files:
+                rng = random.Random(seed)
+                for obj in rng.choices(files, [obj.size for obj in files], k=samples):
+                    sampled += engine.read_cost(obj.extents, rng.randrange(obj.size))
+        return {
+            "engine": engine.name,
+            "files": len(files),
+            "blocks": blocks,
+            "mean_read_cost": read_cost / blocks if blocks else 0.0,
+            "sampled_read_cost": sampled / samples if files else 0.0,
+            "metadata_bytes": metadata,
+            "extents_per_file": extents / len(files) if files else 0.0,
+        }
+
+    def lookup(self, full_path):
+        """Objeto em um caminho absoluto canônico, percorrido a partir da raiz, sem o dentry cache."""
+        obj = self.root
+        for part in full_path.split("/")[2:]:
+            obj = obj.contents.get(part) if isinstance(obj, Directory) else None
+            if obj is None:
+                break
+        return obj
+
+    def writable(self, full_path, obj=None):
+        """Versão do objeto em `full_path` que pode ser alterada sem afetar snapshots.
+
+        `obj`, se dado, é o objeto já resolvido: se for desta época, é o próprio
+        resultado. Senão, ele e seus ancestrais ainda compartilhados são
+        copiados (sem copiar os filhos) e religados na árvore.
+        """
+        if obj is not None and obj.epoch is self.epoch:
+            return obj
+        with self.locked():
+            forked = self.root.epoch is not self.epoch
+            if forked:
+                self.root = self.root.fork(self.epoch, None)
+                self.dentries.invalidate(f"/{self.root.name}")
+            current = self.root
+            parts = full_path.split("/")
+            for i in range(2, len(parts)):
+                child = current.contents[parts[i]]
+                if child.epoch is not self.epoch:
+                    child = current.contents[parts[i]] = child.fork(self.epoch, current)
+                    self.dentries.invalidate("/".join(parts[:i + 1]))
+                    if isinstance(child, File) and self.owners is not None:
+                        for start, _ in child.extents:
+                            self.owners[start] = child
+                    forked = True
+                current = child
+            if forked:
+                self.tree_version += 1
+            return current
+
+    def enable_stats(self, exporter=None, export_interval=1000):
+        """Ativa a instrumentação: contadores e latências por comando, custo das alocações etc.
+
+        `exporter`, se dado, recebe o resumo a cada `export_interval` comandos
+        e ao fechar o sistema de arquivos.
+        """
+        self.stats = Stats(exporter, export_interval)
+        self.stats.source = self
+        self.disk.stats = self.stats
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = self.disk.stats = None
+
+    def show_stats(self, mode=""):
+        """Comando `stats`: exibe as estatísticas; `stats on`/`stats off` liga e desliga a coleta."""
+        if mode == "on":
+            if self.stats is None:
+                self.enable_stats()
+            return "Estatísticas ativadas."
+        if mode == "off":
+            self.disable_stats()
+            return "Estatísticas desativadas."
+        if mode:
+            return "Erro: Use 'stats', 'stats on' ou 'stats off'."
+        if self.stats is None:
+            return "Erro: Estatísticas desativadas (use 'stats on')."
+        return self.stats.format()
 
-    def log_operation(self, command, result, details=""):
-        """Adiciona uma entrada ao log de operações."""
-        self.log.append(f"Comando: {command}\nResultado: {result}\nDetalhes: {details}\n")
+    def close(self):
+        """Encerra o gravador de log e desmonta a imagem, se houver."""
+        if self.stats is not None and self.stats.exporter is not None:
+            self.stats.exporter(self.stats.snapshot())
+        if self.image is not None:
+            self.unmount()
+        if self.log_writer is not None:
+            self.log_writer.close()
+            self.log_writer = None
 
+    def log_operation(self, op, args, result, details="", *detail_args):
+        """Adiciona uma entrada ao log de operações.
+
+        `details` é formatado com `detail_args` apenas quando o log é exibido.
+        """
+        op_start = self.local.op_start
+        duration = (time.perf_counter_ns() - op_start) / 1e9 if op_start is not None else 0.0
+        record = LogRecord(op, args, result, details, detail_args, time.time(), duration)
+        self.log.append(record)
+        if self.stats is not None:
+            self.stats.record_log()
+        if self.log_writer is not None:
+            self.log_writer.submit(record)
+
+    @operation
     def mkdir(self, name):
-        if name in self.current_dir.contents:
-            self.log_operation(f"mkdir {name}", "Erro", "Diretório já existe.")
-            return "Erro: Diretório já existe."
+        directory = self.writable(self.path, self.current_dir)
+        with self.dir_lock(directory):
+            if name in directory.contents:
+                self.log_operation("mkdir", (name,), "Erro", "Diretório já existe.")
+                return "Erro: Diretório já existe."
 
-        self.current_dir.contents[name] = Directory(name)
-        self.log_operation(f"mkdir {name}", "Sucesso", f"Diretório criado: {name}.")
+            ino, error = self.link_inode(directory, KIND_DIR, name)
+            if error:
+                self.log_operation("mkdir", (name,), "Erro", error)
+                return f"Erro: {error}"
+
+            directory.contents[name] = Directory(name, ino, parent=directory, epoch=self.epoch)
+            self.dentries.invalidate(f"{self.path}/{name}")
+            if self.names is not None:
+                self.names.add(name, f"{self.path}/{name}")
+            self.metadata_changed()
+        self.log_operation("mkdir", (name,), "Sucesso", "Diretório criado: {}.", name)
         return f"Diretório '{name}' criado com sucesso."
 
+    @operation
     def create_file(self, name, size):
-        if name in self.current_dir.contents:
-            self.log_operation(f"create {name} {size}", "Erro", "Arquivo já existe.")
+        directory = self.current_dir
+        if name in directory.contents:
+            self.log_operation("create", (name, size), "Erro", "Arquivo já existe.")
             return "Erro: Arquivo já existe."
 
-        blocks = self.disk.allocate(size)
-        if blocks is None:
-            self.log_operation(f"create {name} {size}", "Erro", "Espaço insuficiente.")
+        # A alocação (e a compactação que ela pode exigir) ocorre fora do lock
+        # do diretório: a compactação precisa segurar os locks de todos eles
+        extents = self.disk.allocate(size)
+        if extents is None and self.defrag_budget is not None and 0 < size <= self.disk.get_free_space():
+            # Há espaço, mas fragmentado: compacta só até surgir uma extensão suficiente
+            self.compact(goal=size)
+            extents = self.disk.allocate(size)
+        if extents is None:
+            self.log_operation("create", (name, size), "Erro", "Espaço insuficiente.")
             return "Erro: Espaço insuficiente."
 
-        file = File(name, size)
-        file.blocks = blocks
-        self.current_dir.contents[name] = file
+        directory = self.writable(self.path, directory)
+        with self.dir_lock(directory):
+            # Outro cliente pode ter criado o nome enquanto alocávamos
+            error = "Arquivo já existe." if name in directory.contents else None
+            ino = None
+            if error is None:
+                ino, error = self.link_inode(directory, KIND_FILE, name, size, extents)
+            if error:
+                self.disk.free(extents)
+                self.log_operation("create", (name, size), "Erro", error)
+                return f"Erro: {error}"
+
+            file = File(name, size, ino, directory, self.epoch)
+            file.extents = extents
+            self.dentries.invalidate(f"{self.path}/{name}")
+            if self.owners is not None:
+                for start, _ in extents:
+                    self.owners[start] = file
+            directory.contents[name] = file
+            if self.names is not None:
+                self.names.add(name, f"{self.path}/{name}")
+            self.metadata_changed()
+        self.defrag_step()
         self.log_operation(
-            f"create {name} {size}",
-            "Sucesso",
-            f"Arquivo criado: {name}, Blocos alocados: {blocks}."
+            "create", (name, size), "Sucesso",
+            "Arquivo criado: {}, Extensões alocadas: {}.", name, extents
         )
         return f"Arquivo '{name}' criado com sucesso."
 
+    @operation
     def delete(self, name):
-        if name not in self.current_dir.contents:
-            self.log_operation(f"delete {name}", "Erro", "Arquivo/Diretório não encontrado.")
-            return "Erro: Arquivo/Diretório não encontrado."
+        directory = self.writable(self.path, self.current_dir)
+        while True:
+            obj = directory.contents.get(name)
+            if obj is None:
+                self.log_operation("delete", (name,), "Erro", "Arquivo/Diretório não encontrado.")
+                return "Erro: Arquivo/Diretório não encontrado."
+            # Um subdiretório também é bloqueado, para que nada seja criado nele
+            # entre a verificação de que está vazio e a remoção
+            with self.locked(directory, obj):
+                if directory.contents.get(name) is not obj:
+                    continue  # Removido ou substituído por outro cliente
+                if isinstance(obj, Directory) and obj.contents:
+                    self.log_operation("delete", (name,), "Erro", "Diretório não está vazio.")
+                    return "Erro: Diretório não está vazio."
+                if isinstance(obj, Directory) and self.encloses_cwd(f"{self.path}/{name}"):
+                    self.log_operation("delete", (name,), "Erro", "Diretório em uso por outra sessão.")
+                    return "Erro: Diretório em uso por outra sessão."
+                if isinstance(obj, File):
+                    # Desregistra antes de liberar: liberadas, as extensões já
+                    # podem ser alocadas (e registradas) por outro cliente
+                    if self.owners is not None:
+                        for start, _ in obj.extents:
+                            del self.owners[start]
+                    self.cache.discard(obj.extents)
+                    self.disk.free(obj.extents)
+                if obj.ino is not None:
+                    self.image.unlink(obj.ino)
+                del directory.contents[name]
+                self.dentries.invalidate(f"{self.path}/{name}", subtree=isinstance(obj, Directory))
+                if self.names is not None:
+                    self.names.discard(name, f"{self.path}/{name}")
+                self.metadata_changed()
+            break
 
-        obj = self.current_dir.contents[name]
         if isinstance(obj, File):
-            self.disk.free(obj.blocks)
             self.log_operation(
-                f"delete {name}",
-                "Sucesso",
-                f"Arquivo excluído: {name}, Blocos liberados: {obj.blocks}."
+                "delete", (name,), "Sucesso",
+                "Arquivo excluído: {}, Extensões liberadas: {}.", name, obj.extents
             )
-        elif isinstance(obj, Directory):
-            if obj.contents:
-                self.log_operation(f"delete {name}", "Erro", "Diretório não está vazio.")
-                return "Erro: Diretório não está vazio."
-            self.log_operation(f"delete {name}", "Sucesso", f"Diretório excluído: {name}.")
-
-        del self.current_dir.contents[name]
+        else:
+            self.log_operation("delete", (name,), "Sucesso", "Diretório excluído: {}.", name)
+        self.defrag_step()
         return f"'{name}' excluído com sucesso."
 
-    def ls(self):
-        contents = [f"[DIR] {name}" if isinstance(obj, Directory) else f"[FILE] {name}"
-                    for name, obj in self.current_dir.contents.items()]
-        self.log_operation("ls", "Sucesso", f"Conteúdo: {contents}")
-        return "\n".join(contents)
+    @staticmethod
+    def walk(directory):
+        """Gera todos os descendentes de `directory`, cada diretório antes do seu conteúdo."""
+        stack = [directory]
+        while stack:
+            for obj in stack.pop().contents.values():
+                yield obj
+                if isinstance(obj, Directory):
+                    stack.append(obj)
+
+    @staticmethod
+    def walk_paths(directory, path):
+        """Como `walk`, mas gera (caminho absoluto, objeto); `path` é o caminho de `directory`."""
+        stack = [(directory, path)]
+        while stack:
+            current, prefix = stack.pop()
+            for name, obj in current.contents.items():
+                child_path = f"{prefix}/{name}"
+                yield child_path, obj
+                if isinstance(obj, Directory):
+                    stack.append((obj, child_path))
+
+    def index_tree(self, obj, full_path, present=True):
+        """Inclui no índice de nomes (ou, sem `present`, retira) `obj` e toda a subárvore abaixo dele."""
+        if self.names is None:
+            return
+        update = self.names.add if present else self.names.discard
+        update(obj.name, full_path)
+        if isinstance(obj, Directory):
+            for path, child in self.walk_paths(obj, full_path):
+                update(child.name, path)
+
+    def name_index(self):
+        """Índice global de nomes; numa imagem montada ou após `restore`, exige percorrer a árvore."""
+        if self.names is None:
+            with self.locked():
+                if self.names is None:
+                    names = NameIndex()
+                    for path, obj in self.walk_paths(self.root, f"/{self.root.name}"):
+                        names.add(obj.name, path)
+                    self.names = names
+        return self.names
+
+    def encloses_cwd(self, full_path):
+        """Indica se `full_path` é o diretório atual de alguma sessão viva ou um de seus ancestrais.
+
+        Os comandos que desligam diretórios da árvore chamam este método
+        segurando o lock do diretório; `cd` troca de diretório segurando o
+        mesmo lock, de modo que nenhuma sessão fica num diretório removido.
+        """
+        prefix = full_path + "/"
+        return any(session.path == full_path or session.path.startswith(prefix) for session in list(self.sessions))
+
+    def resolve_target(self, obj, dest):
+        """Destino de `cp`/`mv`: dentro de `dest`, se for um diretório; senão, `dest` é o novo nome.
+
+        Retorna (diretório, nome, caminho absoluto, erro).
+        """
+        target, dest_path = self.resolve(dest)
+        if isinstance(target, Directory):
+            parent, name, dest_path = target, obj.name, f"{dest_path}/{obj.name}"
+        else:
+            parent = None
+            if dest_path is not None:
+                parent_path, _, name = dest_path.rpartition("/")
+                parent, _ = self.resolve(parent_path)
+            if not isinstance(parent, Directory):
+                return None, None, None, "Caminho inválido."
+        if name in parent.contents:
+            return None, None, None, "Destino já existe."
+        return parent, name, dest_path, None
+
+    @operation
+    def remove(self, path, recursive=False):
+        """Remove um arquivo ou diretório; com `recursive` (`rm -r`), também todo o seu conteúdo.
+
+        As extensões da subárvore são fundidas e devolvidas ao disco em um
+        único lote, e a operação inteira gera um só registro de log.
+        """
+        args = ("-r", path) if recursive else (path,)
+        # A subárvore pode ter diretórios em qualquer listra: segura todas
+        with self.locked():
+            obj, full_path = self.resolve(path)
+            error = None
+            if obj is None:
+                error = "Arquivo/Diretório não encontrado."
+            elif self.encloses_cwd(full_path):
+                error = "Não é possível remover o diretório atual de uma sessão ou um de seus ancestrais."
+            elif isinstance(obj, Directory) and obj.contents and not recursive:
+                error = "Diretório não está vazio."
+            if error:
+                self.log_operation("rm", args, "Erro", error)
+                return f"Erro: {error}"
+
+            descendants = list(self.walk(obj)) if isinstance(obj, Directory) else []
+            files = [child for child in descendants if isinstance(child, File)]
+            directories = len(descendants) - len(files) + 1
+            if isinstance(obj, File):
+                files.append(obj)
+                directories = 0
+            extents = [extent for file in files for extent in file.extents]
+            # Desregistra antes de liberar, como em `delete`
+            if self.owners is not None:
+                for start, _ in extents:
+                    del self.owners[start]
+            freed = coalesce_extents(extents)
+            self.cache.discard(freed)
+            self.disk.free_batch(extents)
+            if obj.ino is not None:
+                # Só o topo sai da lista do pai; os inodes abaixo dele voltam direto à lista livre
+                self.image.unlink(obj.ino)
+                self.image.release([child.ino for child in descendants])
+            parent = self.writable(full_path.rpartition("/")[0], obj.parent)
+            del parent.contents[obj.name]
+            self.dentries.invalidate(full_path, subtree=True)
+            self.index_tree(obj, full_path, present=False)
+            self.metadata_changed()
+
+        self.log_operation(
+            "rm", args, "Sucesso", "Removido: {}, Arquivos: {}, Diretórios: {}, Blocos liberados: {}.",
+            full_path, len(files), directories,
+            sum(length for _, length in freed)
+        )
+        self.defrag_step()
+        return f"'{path}' removido com sucesso."
+
+    def allocate_copies(self, files):
+        """Aloca, em um lote, o espaço das cópias de `files`; retorna as extensões ou None."""
+        sizes = [file.size for file in files]
+        allocated = self.disk.allocate_batch(sizes)
+        if None not in allocated:
+            return allocated
+        self.disk.free_batch([extent for extents in allocated if extents for extent in extents])
+        if self.defrag_budget is None or sum(sizes) > self.disk.get_free_space():
+            return None
+        # Há espaço, mas fragmentado: compactado, o espaço livre é uma única extensão
+        self.compact()
+        return self.disk.allocate_batch(sizes)
+
+    @operation
+    def copy(self, source, dest):
+        """Copia um arquivo ou, recursivamente, um diretório (`cp`).
+
+        O espaço de todas as cópias é alocado em um único lote e a operação
+        gera um só registro de log.
+        """
+        with self.locked():
+            obj, src_path = self.resolve(source)
+            if obj is None:
+                parent, name, dest_path, error = None, None, None, "Arquivo/Diretório não encontrado."
+            else:
+                parent, name, dest_path, error = self.resolve_target(obj, dest)
+            if not error and dest_path.startswith(src_path + "/"):
+                error = "Não é possível copiar um diretório para dentro de si mesmo."
+            files = []
+            if not error:
+                files = [obj] if isinstance(obj, File) else [c for c in self.walk(obj) if isinstance(c, File)]
+                allocated = self.allocate_copies(files)
+                if allocated is None:
+                    error = "Espaço insuficiente."
+            if error:
+                self.log_operation("cp", (source, dest), "Erro", error)
+                return f"Erro: {error}"
+
+            parent = self.writable(dest_path.rpartition("/")[0], parent)
+            # Monta a cópia em pré-ordem; o topo só é ligado ao destino no fim
+            extents_of = {id(file): extents for file, extents in zip(files, allocated)}
+            created = []  # Inodes criados, para desfazer a cópia em caso de erro
+            copies = []   # (original, cópia) de cada arquivo
+            top = None
+            stack = [(obj, parent, name)]
+            while stack:
+                original, target, new_name = stack.pop()
+                if isinstance(original, File):
+                    extents = extents_of[id(original)]
+                    ino, error = self.link_inode(target, KIND_FILE, new_name, original.size, extents,
+                                                 original.length)
+                    new = File(new_name, original.size, ino, target, self.epoch)
+                    new.extents, new.length = extents, original.length
+                    copies.append((original, new))
+                else:
+                    ino, error = self.link_inode(target, KIND_DIR, new_name)
+                    new = Directory(new_name, ino, parent=target, epoch=self.epoch)
+                    stack.extend((child, new, child_name)
+                                 for child_name, child in reversed(list(original.contents.items())))
+                if error:
+                    break
+                if ino is not None:
+                    created.append(ino)
+                if top is None:
+                    top = new
+                else:
+                    target.contents[new_name] = new
+            if error:
+                for ino in reversed(created):
+                    self.image.unlink(ino)
+                self.disk.free_batch([extent for extents in allocated for extent in extents])
+                self.log_operation("cp", (source, dest), "Erro", error)
+                return f"Erro: {error}"
+
+            blocks = 0
+            for original, new in copies:
+                for old_block, new_block in zip(original.iter_blocks(self.data_blocks(original)), new.iter_blocks()):
+                    self.cache.write(new_block, self.cache.read(old_block))
+                if self.owners is not None:
+                    for start, _ in new.extents:
+                        self.owners[start] = new
+                blocks += new.size
+            parent.contents[name] = top
+            self.dentries.invalidate(dest_path, subtree=True)
+            self.index_tree(top, dest_path)
+            self.metadata_changed()
+
+        self.log_operation("cp", (source, dest), "Sucesso", "Copiado: {} -> {}, Arquivos: {}, Blocos: {}.",
+                           src_path, dest_path, len(copies), blocks)
+        self.defrag_step()
+        return f"'{source}' copiado para '{dest_path}'."
+
+    @operation
+    def move(self, source, dest):
+        """Move ou renomeia um arquivo ou diretório (`mv`), sem copiar seus blocos."""
+        with self.locked():
+            obj, src_path = self.resolve(source)
+            if obj is None:
+                parent, name, dest_path, error = None, None, None, "Arquivo/Diretório não encontrado."
+            elif self.encloses_cwd(src_path):
+                parent, name, dest_path, error = None, None, None, (
+                    "Não é possível mover o diretório atual de uma sessão ou um de seus ancestrais.")
+            else:
+                parent, name, dest_path, error = self.resolve_target(obj, dest)
+            if not error and dest_path.startswith(src_path + "/"):
+                error = "Não é possível mover um diretório para dentro de si mesmo."
+            if not error and obj.ino is not None and not self.image.name_fits(name):
+                error = "Nome muito longo."
+            if error:
+                self.log_operation("mv", (source, dest), "Erro", error)
+                return f"Erro: {error}"
+
+            # O objeto muda de nome e de pai: os dois lados precisam ser próprios desta época
+            obj = self.writable(src_path, obj)
+            parent = self.writable(dest_path.rpartition("/")[0], parent)
+            if obj.ino is not None:
+                self.image.move(obj.ino, parent.ino, name)
+            self.index_tree(obj, src_path, present=False)
+            del obj.parent.contents[obj.name]
+            obj.name, obj.parent = name, parent
+            parent.contents[name] = obj
+            self.dentries.invalidate(src_path, subtree=True)
+            self.dentries.invalidate(dest_path, subtree=True)
+            self.index_tree(obj, dest_path)
+            self.metadata_changed()
+
+        self.log_operation("mv", (source, dest), "Sucesso", "Movido: {} -> {}.", src_path, dest_path)
+        return f"'{source}' movido para '{dest_path}'."
+
+    def relocate(self, file, source, start, length=None):
+        """Move os `length` primeiros blocos (todos, por padrão) da extensão do arquivo que começa em `source` para `start`.
+
+        O destino deve estar livre ou, se sobrepuser a origem, vir antes dela.
+        Movendo só parte da extensão, o restante continua no lugar como uma
+        nova extensão do arquivo. Retorna o número de blocos movidos.
+        """
+        index = next(i for i, (first, _) in enumerate(file.extents) if first == source)
+        total = file.extents[index][1]
+        length = total if length is None else length
+        del self.owners[source]
+        self.disk.free([(source, length)])
+        self.disk.allocate_at(start, length)
+        self.owners[start] = file
+        file.extents[index:index + 1] = [(start, length)] + ([(source + length, total - length)] if length < total else [])
+        if length < total:
+            self.owners[source + length] = file
+
+        # Copia os blocos com dados; com o destino antes da origem, a ordem crescente é segura
+        offset = sum(n for _, n in file.extents[:index])
+        for i in range(max(0, min(length, self.data_blocks(file) - offset))):
+            self.cache.write(start + i, self.cache.read(source + i))
+        if start + length <= source or start >= source + length:
+            self.cache.discard([(source, length)])
+        else:
+            self.cache.discard([(start + length, source - start)])
+
+        # Funde com a extensão anterior do arquivo, se ficaram adjacentes
+        if index and sum(file.extents[index - 1]) == start:
+            del self.owners[start]
+            file.extents[index - 1:index + 1] = [(file.extents[index - 1][0], file.extents[index - 1][1] + length)]
+        if file.ino is not None:
+            self.image.update_inode(file.ino, extents=tuple(file.extents))
+        self.blocks_moved += length
+        return length
+
+    def compact(self, budget=None, goal=None):
+        """Compacta o disco deslizando arquivos para o início.
+
+        A cada passo a extensão logo após o primeiro buraco é movida para o
+        início desse buraco; extensões já encostadas no início do disco nunca
+        são movidas. Com `budget`, cada chamada move no máximo `budget` blocos
+        (ao menos um): uma extensão maior desliza em partes, ao longo de várias
+        chamadas. Com `goal`, primeiro tenta abrir uma extensão livre de `goal`
+        blocos movendo o mínimo de blocos (`eviction_plan`); se não houver como,
+        desliza até ela surgir. Retorna o número de blocos movidos.
+
+        Segura os locks de todos os diretórios e o do disco: nenhum outro
+        comando usa os arquivos enquanto suas extensões são movidas.
+        """
+        moved = 0
+        with self.locked(), self.disk.lock:
+            if goal is not None and self.disk.largest_free_run() < goal:
+                plan = self.eviction_plan(goal)
+                if plan is not None and (budget is None or sum(n for _, _, n, _ in plan) <= budget):
+                    for file, source, _, dest in plan:
+                        moved += self.relocate(file, source, dest)
+                    return moved
+            while budget is None or moved < budget:
+                if goal is not None and self.disk.largest_free_run() >= goal:
+                    break
+                hole = self.disk.free_extents.first()
+                if hole is None:
+                    break
+                source = hole[0] + hole[1]
+                file = self.owner_map().get(source)
+                if file is None:
+                    break  # Só resta o buraco final: disco compacto
+                length = None
+                if budget is not None:
+                    extent = (source, dict(file.extents)[source])
+                    index = file.extents.index(extent)
+                    # Partir a extensão acrescenta uma ao arquivo, a menos que a
+                    # parte movida encoste na anterior (continuação de um deslize);
+                    # com o inode cheio, a extensão é movida inteira
+                    if len(file.extents) < INODE_EXTENTS or (index and sum(file.extents[index - 1]) == hole[0]):
+                        length = min(extent[1], budget - moved)
+                moved += self.relocate(file, source, hole[0], length)
+        return moved
+
+    def eviction_plan(self, goal):
+        """Extensões a mover para abrir uma extensão livre de `goal` blocos movendo o mínimo de blocos.
+
+        Percorre o disco como uma sequência de buracos e extensões de arquivos
+        e escolhe, entre as janelas contíguas com pelo menos `goal` blocos, as
+        de menos blocos ocupados; as extensões de uma janela são levadas
+        (best-fit) para buracos fora dela. Retorna [(arquivo, origem,
+        comprimento, destino)] da janela mais barata que couber (entre as oito
+        mais baratas), ou None.
+        """
+        owners = self.owner_map()
+        index = self.disk.free_extents
+        # Segmentos em ordem de endereço: (início, comprimento, arquivo), com
+        # arquivo None para um buraco e False para blocos que não podem ser movidos
+        segments = []
+        position = 0
+        for hole in [*index.starts, self.disk.size]:
+            while position < hole:
+                file = owners.get(position)
+                if file is None:
+                    segments.append((position, hole - position, False))
+                    break
+                length = dict(file.extents)[position]
+                segments.append((position, length, file))
+                position += length
+            if hole < self.disk.size:
+                segments.append((hole, index.lengths[hole], None))
+                position = hole + index.lengths[hole]
+
+        # Para cada início i, a menor janela [i, j) com `goal` blocos (dois ponteiros)
+        end = lambda k: segments[k][0] + segments[k][1]
+        candidates = []
+        j = used = blocked = 0  # Blocos ocupados e segmentos imóveis na janela
+        for i, (start, length, file) in enumerate(segments):
+            while j < len(segments) and (j == i or end(j - 1) - start < goal):
+                used += segments[j][1] if segments[j][2] else 0
+                blocked += segments[j][2] is False
+                j += 1
+            if end(j - 1) - start >= goal and not blocked:
+                candidates.append((used, i, j))
+            used -= length if file else 0
+            blocked -= file is False
+
+        free = self.disk.get_free_space()
+        for used, i, j in sorted(candidates)[:8]:
+            window = segments[i:j]
+            if used > free - sum(length for _, length, file in window if file is None):
+                continue
+            # Buracos fora da janela, em ordem de tamanho, para o best-fit
+            first, last = window[0][0], window[-1][0] + window[-1][1]
+            holes = sorted((length, start) for start, length, file in segments
+                           if file is None and not first <= start < last)
+            plan = []
+            for start, length, file in sorted(window, key=lambda segment: -segment[1]):
+                if not file:
+                    continue
+                k = bisect.bisect_left(holes, (length, -1))
+                if k == len(holes):
+                    break
+                hole_length, hole_start = holes.pop(k)
+                plan.append((file, start, length, hole_start))
+                if hole_length > length:
+                    bisect.insort(holes, (hole_length - length, hole_start + length))
+            else:
+                return plan
+        return None
+
+    def owner_map(self):
+        """Mapa início de extensão -> arquivo; numa imagem montada exige carregar a árvore."""
+        if self.owners is None:
+            self.owners = {}
+            # A compactação altera as extensões dos arquivos: depois de um
+            # snapshot, a árvore ainda compartilhada é copiada por inteiro aqui
+            root = self.writable(f"/{self.root.name}", self.root)
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                for name, obj in directory.contents.items():
+                    if obj.epoch is not self.epoch:
+                        obj = directory.contents[name] = obj.fork(self.epoch, directory)
+                    if isinstance(obj, Directory):
+                        stack.append(obj)
+                    else:
+                        for start, _ in obj.extents:
+                            self.owners[start] = obj
+            if root.epoch is not None:
+                self.dentries.clear()
+                self.tree_version += 1
+        return self.owners
+
+    def defrag_step(self):
+        """Executa a desfragmentação incremental limitada pelo orçamento configurado."""
+        if self.defrag_budget:
+            self.compact(budget=self.defrag_budget)
+
+    @operation
+    def defrag(self, max_blocks=None):
+        if self.disk.engine.name != "contiguous":
+            self.log_operation("defrag", () if max_blocks is None else (max_blocks,), "Erro",
+                               "A desfragmentação só se aplica à alocação contígua.")
+            return "Erro: A desfragmentação só se aplica à alocação contígua."
+        moved = self.compact(budget=max_blocks)
+        if moved:
+            self.metadata_changed()
+        with self.disk.lock:
+            hole = self.disk.free_extents.first()
+        done = hole is None or hole[0] + hole[1] == self.disk.size
+        result = "Desfragmentação concluída" if done else "Desfragmentação parcial"
+        details = (
+            f"{result}: {moved} blocos movidos, "
+            f"Maior extensão livre: {self.disk.largest_free_run()}."
+        )
+        self.log_operation("defrag", () if max_blocks is None else (max_blocks,), "Sucesso", details)
+        return details
+
+    @operation
+    def ls(self, sort=False, offset=0, limit=None, out=None):
+        """Lista o diretório atual; com `out`, escreve nele linha a linha, sem montar a saída."""
+        with self.dir_lock(self.current_dir):
+            lines = self.iter_ls(sort, offset, limit)
+            if out is None:
+                return "\n".join(lines)
+            for line in lines:
+                out.write(line + "\n")
+            return ""
+
+    def iter_ls(self, sort=False, offset=0, limit=None):
+        """Gera as linhas de `ls` sob demanda, com ordenação e paginação opcionais.
+
+        O gerador não segura o lock do diretório; com clientes concorrentes, use `ls`.
+        """
+        directory = self.current_dir
+        self.log_operation("ls", (), "Sucesso", "Entradas no diretório: {}.", len(directory.contents))
+        entries = itertools.islice(self.entries(directory, sort), offset,
+                                   None if limit is None else offset + limit)
+        return (f"[DIR] {name}" if isinstance(obj, Directory) else f"[FILE] {name}"
+                for name, obj in entries)
 
+    @staticmethod
+    def entries(directory, sort=False):
+        items = directory.contents.items()
+        return iter(sorted(items, key=lambda item: item[0]) if sort else items)
+
+    def normalize(self, path, base_path):
+        """Converte `path` em caminho absoluto canônico ("/RAIZ/a/b").
+
+        Caminhos iniciados por "/" partem da raiz (o componente "RAIZ" inicial
+        é opcional); os demais partem de `base_path`. Retorna None se o
+        caminho subir acima da raiz.
+        """
+        if "/" not in path and path not in ("", ".", ".."):
+            return f"{base_path}/{path}"
+        if path.startswith("/"):
+            parts = path.split("/")[1:]
+            if parts and parts[0] == self.root.name:
+                parts = parts[1:]
+            stack = []
+        else:
+            parts = path.split("/")
+            stack = base_path.split("/")[2:]
+        for part in parts:
+            if part in ("", "."):
+                continue
+            if part == "..":
+                if not stack:
+                    return None
+                stack.pop()
+            else:
+                stack.append(part)
+        return "/".join(["", self.root.name] + stack)
+
+    def resolve(self, path, base_path=None):
+        """Resolve um caminho para o objeto correspondente (ou None), usando o dentry cache.
+
+        Retorna (objeto, caminho absoluto). Caminhos relativos partem de
+        `base_path` (por padrão, o diretório atual).
+        """
+        full_path = self.normalize(path, self.path if base_path is None else base_path)
+        if full_path is None:
+            return None, None
+        obj = self.dentries.get(full_path)
+        if obj is DentryCache.MISSING:
+            generation = self.dentries.generation
+            # Percorre a partir do diretório atual quando o caminho está abaixo dele
+            if full_path.startswith(self.path + "/"):
+                obj, parts = self.current_dir, full_path[len(self.path) + 1:].split("/")
+            else:
+                obj, parts = self.root, full_path.split("/")[2:]
+            for part in parts:
+                obj = obj.contents.get(part) if isinstance(obj, Directory) else None
+                if obj is None:
+                    break
+            self.dentries.put(full_path, obj, generation)
+        return obj, full_path
+
+    @operation
     def cd(self, name):
         if name == "..":
             # Caso especial: Verificar se já estamos na raiz
             if self.current_dir == self.root:
-                self.log_operation("cd ..", "Erro", "Já está no diretório raiz.")
+                self.log_operation("cd", ("..",), "Erro", "Já está no diretório raiz.")
                 return "Erro: Já está no diretório raiz."
 
-            # Navegar para o diretório pai
-            parts = self.path.split("/")
-            parent_path = "/".join(parts[:-1]) or "/RAIZ"
-            self.path = parent_path
-
-            # Reconstruir `current_dir` a partir do novo caminho
-            self.current_dir = self.root
-            if parts[-2] == "RAIZ":
-                self.current_dir = self.root
-                self.log_operation("cd ..", "Sucesso", f"Navegou para {self.path}.")
-                return f"Navegou para {self.path}."
-            self.current_dir = self.current_dir.contents[parts[-2]]
-            self.log_operation("cd ..", "Sucesso", f"Navegou para {self.path}.")
+            # Navegar para o diretório pai pelo ponteiro de pai (num diretório
+            # compartilhado com um snapshot, ele pode ser de outra árvore)
+            session = self.session
+            directory = self.current_dir
+            session.path = session.path.rsplit("/", 1)[0]
+            session.current_dir = directory.parent if directory.epoch is self.epoch else self.lookup(session.path)
+            self.log_operation("cd", ("..",), "Sucesso", "Navegou para {}.", self.path)
             return f"Navegou para {self.path}."
 
-        # Navegar para um subdiretório
-        if name not in self.current_dir.contents or not isinstance(self.current_dir.contents[name], Directory):
-            self.log_operation(f"cd {name}", "Erro", "Diretório não encontrado.")
+        # Navegar para um caminho (relativo ao diretório atual ou absoluto)
+        target, full_path = self.resolve(name)
+        session = self.session
+        while isinstance(target, Directory):
+            # Sob o lock do diretório, `rm`, `mv` e `delete` não podem desligá-lo
+            # da árvore entre a verificação abaixo e a troca de diretório
+            with self.dir_lock(target):
+                current = self.lookup(full_path)
+                if current is target:
+                    session.current_dir = target
+                    session.path = full_path
+                    break
+            target = current  # Removido, movido ou copiado (copy-on-write) por outro cliente
+        if not isinstance(target, Directory):
+            self.log_operation("cd", (name,), "Erro", "Diretório não encontrado.")
             return "Erro: Diretório não encontrado."
 
-        # Atualizar o diretório atual
-        self.current_dir = self.current_dir.contents[name]
-        self.path += f"/{name}"
-        self.log_operation(f"cd {name}", "Sucesso", f"Navegou para {self.path}.")
+        self.log_operation("cd", (name,), "Sucesso", "Navegou para {}.", self.path)
         return f"Navegou para {self.path}."
 
+    @operation
+    def find(self, path=None, pattern="*", regex=False, min_size=None, max_size=None, sort="name"):
+        """Busca entradas pelo nome abaixo de `path` (por padrão, o diretório atual).
+
+        `pattern` é um glob ou, com `regex`, uma expressão regular, casados com
+        o nome inteiro. Com `min_size`/`max_size` (em blocos), só arquivos
+        entram no resultado. `sort="size"` lista do maior para o menor;
+        senão, em ordem de caminho. Usa o índice global de nomes em vez de
+        percorrer a árvore.
+        """
+        args = (path or self.path, pattern)
+        if path is None:
+            base, base_path = self.current_dir, self.path
+        else:
+            base, base_path = self.resolve(path)
+        if not isinstance(base, Directory):
+            self.log_operation("find", args, "Erro", "Diretório não encontrado.")
+            return "Erro: Diretório não encontrado."
+        try:
+            paths = self.name_index().match(pattern, regex)
+        except re.error:
+            self.log_operation("find", args, "Erro", "Expressão regular inválida.")
+            return "Erro: Expressão regular inválida."
+
+        prefix = base_path + "/"
+        sized = min_size is not None or max_size is not None
+        found = []
+        for full_path in paths:
+            if not full_path.startswith(prefix):
+                continue
+            obj = self.lookup(full_path)  # Pode ter sido removido por outro cliente
+            if obj is None or sized and not (
+                    isinstance(obj, File) and (min_size is None or obj.size >= min_size)
+                    and (max_size is None or obj.size <= max_size)):
+                continue
+            found.append((full_path, obj))
+        if sort == "size":
+            found.sort(key=lambda item: (-item[1].size if isinstance(item[1], File) else 0, item[0]))
+        else:
+            found.sort(key=lambda item: item[0])
+        self.log_operation("find", args, "Sucesso", "Entradas encontradas: {}.", len(found))
+        if not found:
+            return "Nenhuma entrada encontrada."
+        return "\n".join(f"[DIR] {full_path}" if isinstance(obj, Directory)
+                         else f"[FILE] {full_path} ({obj.size} blocos)" for full_path, obj in found)
+
+    @operation
     def info(self):
         free_space = self.disk.get_free_space()
         total_space = self.disk.size
-        details = f"Tamanho do disco: {total_space}, Espaço livre: {free_space}, Caminho atual: {self.path}."
-        self.log_operation("info", "Sucesso", details)
+        details = (
+            f"Tamanho do disco: {total_space}, Espaço livre: {free_space}, "
+            f"Maior extensão livre: {self.disk.largest_free_run()}, "
+            f"Extensões livres: {self.disk.free_extent_count()}, "
+            f"Fragmentação: {self.disk.fragmentation():.2f}, Caminho atual: {self.path}."
+        )
+        self.log_operation("info", (), "Sucesso", details)
         return details
 
+    @staticmethod
+    def compile_commands(commands):
+        """Converte um roteiro de comandos em uma lista de operações (função, argumentos, comando).
+
+        A análise é feita uma única vez; comandos inválidos viram operações
+        cuja função é None e cujo argumento é a mensagem de erro.
+        """
+        ops = []
+        for command in commands:
+            name, _, rest = command.strip().partition(" ")
+            entry = COMMANDS.get(name)
+            if entry is None:
+                ops.append((None, "Comando desconhecido.", command))
+                continue
+            method, parser = entry
+            try:
+                ops.append((getattr(FileSystem, method), parser(rest.strip()), command))
+            except ValueError as e:
+                ops.append((None, f"Erro ao executar '{command}': {e}", command))
+        return ops
+
+    def execute_batch(self, commands, session=None):
+        """Executa um roteiro (comandos em texto ou já compilados) e retorna os resultados.
+
+        Com `session`, os comandos usam o diretório atual dessa sessão.
+        Retorna uma lista de CommandResult(comando, status, saída).
+        """
+        if session is not None:
+            with self.using(session):
+                return self.execute_batch(commands)
+        ops = commands if commands and isinstance(commands[0], tuple) else self.compile_commands(commands)
+        results = []
+        append = results.append
+        for function, args, command in ops:
+            if function is None:
+                append(CommandResult(command, "Erro", args))
+                continue
+            try:
+                output = function(self, *args)
+            except OSError as e:
+                # Falha de E/S da imagem ou do log (disco cheio, arquivo removido...);
+                # as demais exceções são defeitos e não são mascaradas
+                output = f"Erro de E/S ao executar '{command}': {e.strerror or e}"
+            append(CommandResult(command, "Erro" if output.startswith("Erro") else "Sucesso", output))
+        return results
+
+    def execute(self, command, session=None):
+        """Executa um único comando em texto e retorna sua saída."""
+        return self.execute_batch([command], session)[0].output
+
     def show_log(self):
-        return "\n".join(self.log)
+        # tuple() copia o deque de uma vez, mesmo com outras threads registrando
+        return "\n".join(record.render() for record in tuple(self.log))
 
+    @operation
     def write(self, path, data):
         """Escreve dados em um arquivo."""
-        # Caminho completo dividido
-        parts = path.strip("/").split("/")
-        file_name = parts[-1]
-        dir_path = parts[:-1]
-
-        # Navegar até o diretório que contém o arquivo
-        current = self.root
-        for part in dir_path:
-            if part in current.contents and isinstance(current.contents[part], Directory):
-                current = current.contents[part]
-            else:
-                self.log_operation(f"write {path} {data}", "Erro", "Caminho inválido.")
-                return "Erro: Caminho inválido."
+        # Resolver o diretório que contém o arquivo (caminhos partem da raiz)
+        dir_path, _, file_name = path.rstrip("/").rpartition("/")
+        current, full_path = self.resolve(dir_path or "/", base_path="/RAIZ")
+        if not isinstance(current, Directory):
+            self.log_operation("write", (path, data), "Erro", "Caminho inválido.")
+            return "Erro: Caminho inválido."
 
-        # Verificar se o arquivo existe
-        if file_name not in current.contents or not isinstance(current.contents[file_name], File):
-            self.log_operation(f"write {path} {data}", "Erro", "Arquivo não encontrado.")
-            return "Erro: Arquivo não encontrado."
+        file = current.contents.get(file_name)
+        if isinstance(file, File) and file.epoch is not self.epoch:
+            current = self.writable(f"{full_path}/{file_name}").parent
+        with self.dir_lock(current):
+            # Verificar se o arquivo existe
+            file = current.contents.get(file_name)
+            if not isinstance(file, File):
+                self.log_operation("write", (path, data), "Erro", "Arquivo não encontrado.")
+                return "Erro: Arquivo não encontrado."
 
-        # Escrever os dados no arquivo
-        current.contents[file_name].data = data
-        self.log_operation(f"write {path} {data}", "Sucesso", f"Dados escritos no arquivo: {file_name}.")
+            encoded = data.encode()
+            block_size = self.disk.device.block_size
+            if len(encoded) > file.size * block_size:
+                self.log_operation("write", (path, data), "Erro", "Dados excedem o tamanho do arquivo.")
+                return "Erro: Dados excedem o tamanho do arquivo."
+
+            # Escrever os dados nos blocos do arquivo, através do cache de páginas
+            for i, block in zip(range(0, len(encoded), block_size), file.iter_blocks()):
+                self.cache.write(block, encoded[i:i + block_size])
+            file.length = len(encoded)
+            if file.ino is not None:
+                self.image.update_inode(file.ino, length=file.length)
+                self.metadata_changed()
+        self.log_operation("write", (path, data), "Sucesso", "Dados escritos no arquivo: {}.", file_name)
         return f"Dados escritos no arquivo '{file_name}'."
 
+    @operation
     def read(self, path):
         """Lê dados de um arquivo."""
-        # Caminho completo dividido
-        parts = path.strip("/").split("/")
-        file_name = parts[-1]
-        dir_path = parts[:-1]
-
-        # Navegar até o diretório que contém o arquivo
-        current = self.root
-        for part in dir_path:
-            if part in current.contents and isinstance(current.contents[part], Directory):
-                current = current.contents[part]
-            else:
-                self.log_operation(f"read {path}", "Erro", "Caminho inválido.")
-                return "Erro: Caminho inválido."
+        # Resolver o diretório que contém o arquivo (caminhos partem da raiz)
+        dir_path, _, file_name = path.rstrip("/").rpartition("/")
+        current, _ = self.resolve(dir_path or "/", base_path="/RAIZ")
+        if not isinstance(current, Directory):
+            self.log_operation("read", (path,), "Erro", "Caminho inválido.")
+            return "Erro: Caminho inválido."
 
-        # Verificar se o arquivo existe
-        if file_name not in current.contents or not isinstance(current.contents[file_name], File):
-            self.log_operation(f"read {path}", "Erro", "Arquivo não encontrado.")
-            return "Erro: Arquivo não encontrado."
+        with self.dir_lock(current):
+            # Verificar se o arquivo existe
+            file = current.contents.get(file_name)
+            if not isinstance(file, File):
+                self.log_operation("read", (path,), "Erro", "Arquivo não encontrado.")
+                return "Erro: Arquivo não encontrado."
 
-        # Retornar os dados do arquivo
-        data = current.contents[file_name].data
-        self.log_operation(f"read {path}", "Sucesso", f"Dados lidos do arquivo: {file_name}.")
+            # Retornar os dados do arquivo, lidos bloco a bloco
+            data = b"".join(self.cache.read(block) for block in file.iter_blocks(self.data_blocks(file)))
+        data = data[:file.length].decode(errors="replace")
+        self.log_operation("read", (path,), "Sucesso", "Dados lidos do arquivo: {}.", file_name)
         return f"Conteúdo do arquivo '{file_name}': {data}"
 
-    def tree(self, current=None, prefix=""):
-        """Exibe a estrutura hierárquica do sistema de arquivos."""
-        if current is None:
-            current = self.root  # Começa na raiz
+    def data_blocks(self, file):
+        """Número de blocos do arquivo que contêm dados."""
+        return -(-file.length // self.disk.device.block_size)
 
-        output = ""
-        for name, obj in current.contents.items():
-            if isinstance(obj, Directory):
-                output += f"{prefix}[DIR] {name}\n"
-                output += self.tree(obj, prefix + "    ")  # Recurso recursivo para subdiretórios
-            elif isinstance(obj, File):
-                output += f"{prefix}[FILE] {name} ({obj.size} blocos)\n"
+    def write_at(self, file, offset, data):
+        """Grava `data` a partir do byte `offset` do arquivo, através do cache de páginas."""
+        block_size = self.disk.device.block_size
+        first, skip = divmod(offset, block_size)
+        position = 0
+        for block in itertools.islice(file.iter_blocks(), first, None):
+            if position >= len(data):
+                break
+            chunk = data[position:position + block_size - skip]
+            # O início de um bloco parcial é preservado relendo-o
+            self.cache.write(block, self.cache.read(block)[:skip] + chunk if skip else chunk)
+            position += len(chunk)
+            skip = 0
+
+    def change_size(self, file, size):
+        """Muda o tamanho de `file` para `size` blocos, mantendo os dados que couberem.
+
+        Ao crescer, usa os blocos logo após o fim do arquivo quando estão
+        livres; senão o motor acrescenta extensões. Na alocação contígua, um
+        arquivo que já tem INODE_EXTENTS extensões é realocado na maior
+        extensão livre, onde sobra mais espaço para crescer no lugar depois.
+        Retorna (erro ou None, blocos copiados).
+        """
+        if size == file.size:
+            return None, 0
+        # Desregistra antes de liberar, como em `delete`
+        if self.owners is not None:
+            for start, _ in file.extents:
+                del self.owners[start]
+        copied = 0
+        if size < file.size:
+            extents, freed = self.disk.shrink(file.extents, file.size, size)
+            self.cache.discard(freed)
+        else:
+            extents = self.disk.extend(file.extents, file.size, size - file.size)
+            if extents is None and self.disk.engine.name == "contiguous":
+                extents = self.disk.allocate_largest(size)
+                if extents is not None:
+                    copied = self.data_blocks(file)
+                    for old_block, new_block in zip(file.iter_blocks(copied), range(extents[0][0], size + extents[0][0])):
+                        self.cache.write(new_block, self.cache.read(old_block))
+                    self.cache.discard(file.extents)
+                    self.disk.free(file.extents)
+        if extents is not None:
+            file.extents, file.size = extents, size
+            file.length = min(file.length, size * self.disk.device.block_size)
+            self.blocks_copied += copied
+        if self.owners is not None:
+            for start, _ in file.extents:
+                self.owners[start] = file
+        if extents is None:
+            return "Espaço insuficiente.", 0
+        if file.ino is not None:
+            self.image.update_inode(file.ino, size=size, length=file.length, extents=tuple(extents))
+        return None, copied
+
+    def reshape(self, op, args, path, plan):
+        """Base de `append`, `truncate` e `resize`: redimensiona o arquivo em `path` e ajusta seus dados.
+
+        `plan(file)` retorna (novo tamanho em blocos, novo comprimento em bytes,
+        dados a gravar a partir do fim atual ou None); os bytes que passam a
+        fazer parte do arquivo sem dados novos são zerados. Sem uma extensão
+        livre suficiente e com a desfragmentação ativa, compacta o disco
+        (fora do lock do diretório) e tenta mais uma vez.
+        """
+        # Resolver o diretório que contém o arquivo (caminhos partem da raiz)
+        dir_path, _, file_name = path.rstrip("/").rpartition("/")
+        current, full_path = self.resolve(dir_path or "/", base_path="/RAIZ")
+        if not isinstance(current, Directory):
+            self.log_operation(op, args, "Erro", "Caminho inválido.")
+            return "Erro: Caminho inválido."
+
+        block_size = self.disk.device.block_size
+        for attempt in range(2):
+            file = current.contents.get(file_name)
+            if isinstance(file, File) and file.epoch is not self.epoch:
+                current = self.writable(f"{full_path}/{file_name}").parent
+            with self.dir_lock(current):
+                file = current.contents.get(file_name)
+                if not isinstance(file, File):
+                    self.log_operation(op, args, "Erro", "Arquivo não encontrado.")
+                    return "Erro: Arquivo não encontrado."
+                old_size, old_length = file.size, file.length
+                size, length, data = plan(file)
+                if size < 0 or length < 0:
+                    self.log_operation(op, args, "Erro", "Tamanho inválido.")
+                    return "Erro: Tamanho inválido."
+                error, copied = self.change_size(file, size)
+                if error is None:
+                    if data is not None:
+                        self.write_at(file, old_length, data)
+                    elif length > old_length:
+                        self.write_at(file, old_length, bytes(length - old_length))
+                    elif length < old_length and length % block_size:
+                        # Zera o resto do último bloco: os bytes cortados não reaparecem ao crescer
+                        self.write_at(file, length, bytes(block_size - length % block_size))
+                    file.length = length
+                    if file.ino is not None:
+                        self.image.update_inode(file.ino, length=length)
+                    self.metadata_changed()
+                    break
+            if attempt or self.defrag_budget is None or size - old_size > self.disk.get_free_space():
+                self.log_operation(op, args, "Erro", error)
+                return f"Erro: {error}"
+            # Há espaço, mas fragmentado: compacta só até caber o arquivo inteiro
+            self.compact(goal=size)
+
+        self.defrag_step()
+        self.log_operation(
+            op, args, "Sucesso", "Arquivo: {}, Tamanho: {} -> {} blocos, Bytes: {}, Blocos copiados: {}.",
+            file_name, old_size, size, length, copied
+        )
+        return f"Arquivo '{file_name}' com {size} blocos e {length} bytes."
 
-        return output
+    @operation
+    def append(self, path, data):
+        """Acrescenta dados ao fim de um arquivo, que cresce se eles não couberem."""
+        encoded = data.encode()
+        block_size = self.disk.device.block_size
+        return self.reshape("append", (path, data), path, lambda file: (
+            max(file.size, -(-(file.length + len(encoded)) // block_size)), file.length + len(encoded), encoded))
+
+    @operation
+    def truncate(self, path, length=0):
+        """Ajusta um arquivo a `length` bytes, liberando ou alocando blocos (os bytes novos são zeros)."""
+        block_size = self.disk.device.block_size
+        return self.reshape("truncate", (path, length), path, lambda file: (-(-length // block_size), length, None))
+
+    @operation
+    def resize(self, path, size):
+        """Muda o tamanho de um arquivo, em blocos; os dados além do novo tamanho são descartados."""
+        block_size = self.disk.device.block_size
+        return self.reshape("resize", (path, size), path,
+                            lambda file: (size, min(file.length, max(size, 0) * block_size), None))
+
+    @operation
+    def sync(self):
+        """Grava no dispositivo as páginas sujas do cache e, se houver, da imagem."""
+        with self.disk.lock, self.cache.lock:
+            self.cache.flush()
+            if self.image is None:
+                details = "Cache de páginas gravado no disco."
+            else:
+                self.uncommitted = 0
+                details = f"Imagem sincronizada: {self.image.checkpoint(self.disk)} páginas gravadas."
+        self.log_operation("sync", (), "Sucesso", details)
+        return details
+
+    @operation
+    def tree(self, current=None, prefix="", max_depth=None, sort=False, out=None):
+        """Exibe a estrutura hierárquica do sistema de arquivos (em `out`, linha a linha, se dado)."""
+        with self.locked():
+            lines = self.iter_tree(current, prefix, max_depth, sort)
+            if out is None:
+                return "".join(lines)
+            out.writelines(lines)
+            return ""
+
+    def iter_tree(self, current=None, prefix="", max_depth=None, sort=False, offset=0, limit=None):
+        """Gera as linhas de `tree` sob demanda.
+
+        Percorre a árvore em pré-ordem com uma pilha explícita (sem recursão),
+        descendo no máximo `max_depth` níveis; `offset` e `limit` paginam as linhas.
+        Como `iter_ls`, não segura locks; com clientes concorrentes, use `tree`.
+        """
+        lines = self._walk_tree(self.root if current is None else current, prefix, max_depth, sort)
+        return itertools.islice(lines, offset, None if limit is None else offset + limit)
+
+    def _walk_tree(self, current, prefix, max_depth, sort):
+        stack = [self.entries(current, sort)]  # Um iterador de entradas por nível
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            name, obj = entry
+            indent = prefix + "    " * (len(stack) - 1)
+            if isinstance(obj, Directory):
+                yield f"{indent}[DIR] {name}\n"
+                if max_depth is None or len(stack) < max_depth:
+                    stack.append(self.entries(obj, sort))
+            else:
+                yield f"{indent}[FILE] {name} ({obj.size} blocos)\n"
 
 # Interface CLI
 def main():
-    fs = FileSystem(disk_size=100)
+    parser = argparse.ArgumentParser(description="Simulador de Sistema de Arquivos")
+    parser.add_argument("image", nargs="?", help="imagem de disco persistente a montar (ou criar)")
+    parser.add_argument("--record", metavar="TRACE", help="grava os comandos da sessão em um trace JSONL")
+    args = parser.parse_args()
+
+    # Com um caminho como argumento, usa (ou cria) uma imagem de disco persistente
+    if args.image and os.path.exists(args.image):
+        fs = FileSystem.mount(args.image)
+    elif args.image:
+        fs = FileSystem(disk_size=100, image=args.image)
+    else:
+        fs = FileSystem(disk_size=100)
+    trace = None
+    if args.record:
+        trace = TraceWriter(args.record, source="cli", disk_size=fs.disk.size,
+                            policy=fs.disk.policy, block_size=fs.disk.device.block_size)
     print("Simulador de Sistema de Arquivos\n")
     while True:
         command = input(f"{fs.path}> ").strip()
-        if command.startswith("mkdir"):
-            _, name = command.split(maxsplit=1)
-            print(fs.mkdir(name))
-        elif command.startswith("create"):
-            _, name, size = command.split(maxsplit=2)
-            print(fs.create_file(name, int(size)))
-        elif command == "ls":
-            print(fs.ls())
-        elif command.startswith("cd"):
-            _, name = command.split(maxsplit=1)
-            print(fs.cd(name))
-        elif command.startswith("delete"):
-            _, name = command.split(maxsplit=1)
-            print(fs.delete(name))
-        elif command == "info":
-            print(fs.info())
-        elif command.startswith("write"):
-            _, path, data = command.split(maxsplit=2)
-            print(fs.write(path, data))
-        elif command.startswith("read"):
-            _, path = command.split(maxsplit=1)
-            print(fs.read(path))
-        elif command == "log":
-            print(fs.show_log())
-        elif command == "tree":
-            print(fs.tree())
-        elif command == "exit":
+        if command == "exit":
+            fs.close()
+            if trace is not None:
+                trace.close()
             break
+        start = time.perf_counter_ns()
+        # Todos os comandos são analisados e contados como em `execute`, mas
+        # `ls` e `tree` são escritos linha a linha, sem montar a saída inteira
+        op = fs.compile_commands([command])[0]
+        if op[0] is FileSystem.ls or op[0] is FileSystem.tree:
+            op[0](fs, *op[1], out=sys.stdout)
         else:
-            print("Comando desconhecido.")
+            print(fs.execute_batch([op])[0].output)
+        if trace is not None and command:
+            trace.record(command, time.perf_counter_ns() - start)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+import argparse
+import itertools
+import json
+import time
+from benchmark.workload import generate_random_commands
+from main import COMMANDS, FileSystem, TraceWriter, read_trace  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+def write_workload(path, num_commands, seed, disk_size=500, max_size=10):
+    """Grava em `path` um trace com a carga aleatória gerada com `seed`."""
+    commands = generate_random_commands(num_commands, max_size, seed)
+    with TraceWriter(path, source="generator", seed=seed, num_commands=num_commands,
+                     max_size=max_size, disk_size=disk_size) as trace:
+        for command in commands:
+            trace.record(command)
+    return len(commands)
+
+def replay(path, fs=None, chunk_size=4096):
+    """Reexecuta um trace lendo-o em blocos de `chunk_size` comandos.
+
+    Sem `fs`, cria um sistema de arquivos com a configuração do cabeçalho.
+    Retorna um resumo com os tempos da reexecução e, por comando, a
+    duração total gravada no trace (quando houver) e a medida agora.
+    """
+    header, records = read_trace(path)
+    if fs is None:
+        fs = FileSystem(header.get("disk_size", 100), policy=header.get("policy", "first"),
+                        block_size=header.get("block_size", 512))
+    stats = fs.stats or fs.enable_stats()
+    sessions = {}  # Sessão do trace -> Session
+    recorded = {}  # Comando -> duração total gravada (ns)
+    count = errors = 0
+    start = time.perf_counter_ns()
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+        # Executa em lote cada sequência de comandos consecutivos da mesma sessão
+        for session_id, group in itertools.groupby(chunk, key=lambda record: record.get("s")):
+            group = list(group)
+            session = None if session_id is None else sessions.setdefault(session_id, fs.open_session())
+            results = fs.execute_batch(fs.compile_commands([record["c"] for record in group]), session)
+            errors += sum(result.status == "Erro" for result in results)
+            count += len(group)
+            for record in group:
+                if "d" in record:
+                    method = COMMANDS.get(record["c"].split(" ", 1)[0], (None,))[0]
+                    recorded[method] = recorded.get(method, 0) + record["d"]
+    elapsed = time.perf_counter_ns() - start
+    replayed = stats.snapshot()["commands"]
+    return {
+        "trace": path,
+        "header": header,
+        "commands": count,
+        "errors": errors,
+        "elapsed_ns": elapsed,
+        "ops_per_second": count / (elapsed / 1e9) if elapsed else 0.0,
+        "per_command": {
+            name: {"calls": c["calls"], "replay_ns": c["total_ns"], "recorded_ns": recorded.get(name)}
+            for name, c in replayed.items()
+        },
+    }
+
+def print_summary(summary):
+    print(f"Trace: {summary['trace']} ({summary['header'].get('source', '?')})")
+    print(f"Comandos: {summary['commands']}, Erros: {summary['errors']}, "
+          f"Tempo: {summary['elapsed_ns'] / 1e9:.3f} s, {summary['ops_per_second']:.0f} ops/s")
+    print(f"{'Comando':<12} {'Chamadas':>9} {'Reexecução (ms)':>16} {'Gravado (ms)':>13}")
+    for name, c in sorted(summary["per_command"].items()):
+        recorded = f"{c['recorded_ns'] / 1e6:.2f}" if c["recorded_ns"] is not None else "-"
+        print(f"{name:<12} {c['calls']:>9} {c['replay_ns'] / 1e6:>16.2f} {recorded:>13}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera e reexecuta traces de comandos.")
+    commands = parser.add_subparsers(dest="action", required=True)
+    generate = commands.add_parser("generate", help="grava um trace com uma carga aleatória determinística")
+    generate.add_argument("trace")
+    generate.add_argument("--commands", type=int, default=100000)
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--disk-size", type=int, default=500)
+    run = commands.add_parser("replay", help="reexecuta um trace e mede os tempos")
+    run.add_argument("trace")
+    run.add_argument("--output", help="grava o resumo em JSON")
+    args = parser.parse_args()
+
+    if args.action == "generate":
+        count = write_workload(args.trace, args.commands, args.seed, args.disk_size)
+        print(f"{count} comandos gravados em {args.trace}")
+        return
+    summary = replay(args.trace)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import os
+import struct
+from main import FileSystem  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+# Protocolo: cada requisição é uma linha com um comando da CLI (UTF-8).
+# Cada resposta é um cabeçalho (status, tamanho) seguido da saída do
+# comando; as respostas chegam na mesma ordem das requisições, então um
+# cliente pode enviar várias requisições sem esperar (pipelining).
+RESPONSE = struct.Struct("!BI")  # Status (0 = sucesso, 1 = erro), bytes da saída
+STATUS_CODES = {"Sucesso": 0, "Erro": 1}
+MAX_LINE = 64 * 1024
+
+def encode_response(status, output):
+    body = output.encode()
+    return RESPONSE.pack(STATUS_CODES[status], len(body)) + body
+
+async def read_response(reader):
+    """Lê uma resposta do servidor; retorna (status, saída)."""
+    status, size = RESPONSE.unpack(await reader.readexactly(RESPONSE.size))
+    body = await reader.readexactly(size)
+    return ("Sucesso", "Erro")[status], body.decode()
+
+class CommandServer:
+    """Servidor asyncio que executa comandos em um único FileSystem, com uma sessão por conexão."""
+
+    def __init__(self, fs, max_pending=32):
+        self.fs = fs
+        # Requisições lidas e ainda não respondidas, por conexão; com a fila
+        # cheia o servidor para de ler do socket e o TCP segura o cliente
+        self.max_pending = max_pending
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        session = self.fs.open_session()
+        pending = asyncio.Queue(self.max_pending)
+        self.connections += 1
+        executor = asyncio.create_task(self.execute(session, pending, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Linha maior que o limite do leitor: descarta a conexão
+                    break
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                if command == "exit":
+                    break
+                if command:
+                    await pending.put(command)
+        except ConnectionError:
+            pass
+        finally:
+            await pending.put(None)
+            await executor
+            self.connections -= 1
+            writer.close()
+
+    async def execute(self, session, pending, writer):
+        """Executa os comandos da conexão em ordem e escreve as respostas."""
+        fs = self.fs
+        done = False
+        while not done:
+            # Executa de uma vez os comandos já enfileirados (pipelining)
+            commands = [await pending.get()]
+            while commands[-1] is not None and not pending.empty():
+                commands.append(pending.get_nowait())
+            if commands[-1] is None:
+                commands.pop()
+                done = True
+            if not commands:
+                return
+            # O FileSystem é thread-safe: o lote roda em uma thread para que
+            # um commit do journal (fsync e msync) ou uma compactação não
+            # bloqueiem as demais conexões; esperar por ele mantém a ordem
+            results = await asyncio.to_thread(fs.execute_batch, fs.compile_commands(commands), session)
+            self.requests += len(results)
+            writer.writelines(encode_response(result.status, result.output) for result in results)
+            try:
+                # Só espera quando o buffer de saída passou do limite (backpressure)
+                await writer.drain()
+            except ConnectionError:
+                # Cliente desconectado: descarta o restante da fila
+                while not done and await pending.get() is not None:
+                    pass
+                return
+
+    async def start(self, host=None, port=None, path=None):
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            return await asyncio.start_unix_server(self.handle, path, limit=MAX_LINE, backlog=4096)
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE, backlog=4096)
+
+async def serve(fs, host, port, path):
+    server = await CommandServer(fs).start(host, port, path)
+    where = path or ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Servidor escutando em {where}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de rede do simulador de sistema de arquivos.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--unix", metavar="CAMINHO", help="escuta em um socket Unix em vez de TCP")
+    parser.add_argument("--disk-size", type=int, default=100000)
+    parser.add_argument("--image", help="imagem de disco a montar (ou criar)")
+    args = parser.parse_args()
+
+    if args.image and os.path.exists(args.image):
+        fs = FileSystem.mount(args.image)
+    else:
+        fs = FileSystem(disk_size=args.disk_size, image=args.image)
+    try:
+        asyncio.run(serve(fs, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fs.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import os
+import random
+import pytest
+from main import ALLOCATION_ENGINES, JOURNAL_RECORD, PAGE_SIZE, FileSystem, FreeExtentIndex  # Certifique-se de que `main.py` esteja no mesmo diretório ou no PYTHONPATH
+
+# Árvore de exemplo: um diretório com dois arquivos escritos e um arquivo na raiz
+SETUP = [
+    "mkdir docs", "cd docs", "create a.txt 2", "create b.txt 3", "cd ..", "create c.txt 1",
+    "write docs/a.txt olá mundo", "write docs/b.txt segundo arquivo", "write c.txt raiz",
+]
+
+def run(fs, *commands):
+    """Executa os comandos e falha no primeiro erro."""
+    for command in commands:
+        output = fs.execute(command)
+        assert not output.startswith("Erro"), f"{command}: {output}"
+
+def contents(fs, *paths):
+    """Conteúdo de cada arquivo, como exibido por `read`."""
+    return {path: fs.execute(f"read {path}").partition(": ")[2] for path in paths}
+
+FILES = ("docs/a.txt", "docs/b.txt", "c.txt")
+ORIGINAL = {"docs/a.txt": "olá mundo", "docs/b.txt": "segundo arquivo", "c.txt": "raiz"}
+
+@pytest.fixture(params=sorted(ALLOCATION_ENGINES))
+def fs(request):
+    fs = FileSystem(200, engine=request.param)
+    run(fs, *SETUP)
+    yield fs
+    fs.close()
+
+# Análise dos comandos
+
+@pytest.mark.parametrize("command, message", [
+    ("tree x", "a profundidade deve ser um número inteiro"),
+    ("create a", "esperados um nome e um tamanho em blocos"),
+    ("create a -3", "o tamanho não pode ser negativo"),
+    ("write a", "esperados um caminho e os dados"),
+    ("mv a b c", "esperados uma origem e um destino"),
+    ("ls -limit", "opção sem valor"),
+    ("find -size +x", "o tamanho deve ser um número inteiro"),
+])
+def test_parse_errors_are_reported_in_portuguese(command, message):
+    fs = FileSystem(50)
+    assert fs.execute(command) == f"Erro ao executar '{command}': {message}"
+
+# Índice de extensões livres
+
+def free_runs(free):
+    """Extensões livres de um mapa de blocos ingênuo (lista de booleanos)."""
+    runs, start = [], None
+    for block, is_free in enumerate(free + [False]):
+        if is_free and start is None:
+            start = block
+        elif not is_free and start is not None:
+            runs.append((start, block - start))
+            start = None
+    return runs
+
+def model_fit(runs, size, policy, rover):
+    fits = [(start, length) for start, length in runs if length >= size]
+    if not fits:
+        return None
+    if policy == "best":
+        return min(fits, key=lambda run: (run[1], run[0]))[0]
+    if policy == "next":
+        # A partir da extensão que contém `rover` (ou da seguinte), dando a volta
+        after = [start for start, length in fits if start + length > rover]
+        return after[0] if after else fits[0][0]
+    return fits[0][0]
+
+def check_max_tree(index):
+    """Cada folha guarda a maior extensão que começa em seu balde e cada nó, o máximo dos filhos."""
+    tree, leaves = index.tree, index.leaves
+    for b in range(leaves):
+        first, last = b * index.bucket, (b + 1) * index.bucket
+        assert tree[leaves + b] == max((length for start, length in index.lengths.items()
+                                        if first <= start < last), default=0)
+    for i in range(leaves - 1, 0, -1):
+        assert tree[i] == max(tree[2 * i], tree[2 * i + 1])
+
+@pytest.mark.parametrize("max_leaves", [1, 4, 16, FreeExtentIndex.MAX_LEAVES])
+@pytest.mark.parametrize("seed", range(10))
+def test_free_extent_index_matches_naive_model(monkeypatch, max_leaves, seed):
+    # Com poucas folhas, cada folha da árvore de máximos cobre vários blocos
+    monkeypatch.setattr(FreeExtentIndex, "MAX_LEAVES", max_leaves)
+    rng = random.Random(seed)
+    size = rng.randint(1, 300)
+    index, free, used = FreeExtentIndex(size), [True] * size, []
+    for _ in range(300):
+        if rng.random() < 0.6:
+            n, policy, rover = rng.randint(1, 20), rng.choice(["first", "best", "next"]), rng.randrange(size)
+            if policy == "first":
+                start = index.first_fit(n)
+            elif policy == "best":
+                start = index.best_fit(n)
+            else:
+                start = index.next_fit(n, rover)
+            assert start == model_fit(free_runs(free), n, policy, rover)
+            if start is not None:
+                index.take(start, n)
+                free[start:start + n] = [False] * n
+                used.append((start, n))
+        elif used:
+            start, n = used.pop(rng.randrange(len(used)))
+            index.insert(start, n)
+            free[start:start + n] = [True] * n
+        if rng.random() < 0.05:
+            index = index.copy() if rng.random() < 0.5 else FreeExtentIndex.from_runs(free_runs(free), size)
+        runs = free_runs(free)
+        assert [(start, index.lengths[start]) for start in index.starts] == runs
+        assert index.largest() == max((length for _, length in runs), default=0)
+        check_max_tree(index)
+
+# Custos dos motores de alocação
+
+@pytest.mark.parametrize("engine", sorted(ALLOCATION_ENGINES))
+def test_mean_read_cost_matches_read_cost_of_every_block(engine):
+    fs = FileSystem(400, block_size=64, engine=engine)
+    run(fs, "create a 1", "create b 7", "create c 20", "create d 33", "append d mais")
+    for obj in fs.current_dir.contents.values():
+        costs = [fs.disk.engine.read_cost(obj.extents, offset) for offset in range(obj.size)]
+        assert sum(costs) / obj.size == pytest.approx(fs.disk.engine.mean_read_cost(obj.extents, obj.size))
+    costs = fs.allocation_costs(samples=5000)
+    assert costs["sampled_read_cost"] == pytest.approx(costs["mean_read_cost"], rel=0.1)
+
+# Snapshots e clones
+
+def test_restore_brings_back_contents(fs):
+    snapshot = fs.snapshot()
+    tree = fs.execute("tree")
+    run(fs, "write docs/a.txt alterado", "append c.txt !!", "truncate docs/b.txt 1",
+        "rm docs/b.txt", "mkdir novo", "mv c.txt novo/c.txt")
+    fs.restore(snapshot)
+    assert fs.execute("tree") == tree
+    assert contents(fs, *FILES) == ORIGINAL
+
+def test_restore_is_repeatable(fs):
+    snapshot = fs.snapshot()
+    for data in ("primeira", "segunda"):
+        run(fs, f"write docs/a.txt {data}", "resize docs/a.txt 5")
+        assert contents(fs, "docs/a.txt") == {"docs/a.txt": data}
+        fs.restore(snapshot)
+        assert contents(fs, *FILES) == ORIGINAL
+
+def test_restore_returns_session_to_snapshot_directory(fs):
+    run(fs, "cd docs")
+    snapshot = fs.snapshot()
+    run(fs, "cd ..")
+    fs.restore(snapshot)
+    assert fs.path == "/RAIZ/docs"
+    assert fs.execute("ls") == "[FILE] a.txt\n[FILE] b.txt"
+
+def test_clone_diverges_independently(fs):
+    clone = fs.clone()
+    run(clone, "write docs/a.txt do clone", "cp docs/b.txt copia.txt", "delete c.txt")
+    run(fs, "write docs/b.txt do original")
+    assert contents(fs, *FILES) == {**ORIGINAL, "docs/b.txt": "do original"}
+    assert contents(clone, "docs/a.txt", "docs/b.txt", "copia.txt") == {
+        "docs/a.txt": "do clone", "docs/b.txt": "segundo arquivo", "copia.txt": "segundo arquivo"}
+    assert fs.execute("read copia.txt").startswith("Erro")
+    assert clone.execute("read c.txt").startswith("Erro")
+    clone.close()
+
+def test_clone_of_snapshot_ignores_later_changes(fs):
+    snapshot = fs.snapshot()
+    run(fs, "write docs/a.txt depois", "delete c.txt")
+    clone = fs.clone(snapshot, policy="best")
+    assert contents(clone, *FILES) == ORIGINAL
+    assert clone.disk.policy == "best"
+    clone.close()
+
+def test_snapshot_rejected_on_disk_image(tmp_path):
+    fs = FileSystem(50, image=str(tmp_path / "disco.img"))
+    with pytest.raises(ValueError):
+        fs.snapshot()
+    fs.close()
+
+# Imagens de disco
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / "disco.img")
+    fs = FileSystem(200, image=path)
+    run(fs, *SETUP)
+    return fs, path
+
+def remount(fs, path):
+    fs.close()
+    return FileSystem.mount(path)
+
+def test_remount_keeps_tree_and_contents(image):
+    fs, path = image
+    tree = fs.execute("tree")
+    fs = remount(fs, path)
+    assert fs.execute("tree") == tree
+    assert contents(fs, *FILES) == ORIGINAL
+    fs.close()
+
+def test_remount_keeps_copies(image):
+    fs, path = image
+    run(fs, "cp docs/a.txt copia.txt", "cp docs docs2")
+    fs = remount(fs, path)
+    assert contents(fs, "copia.txt", "docs2/a.txt", "docs2/b.txt") == {
+        "copia.txt": "olá mundo", "docs2/a.txt": "olá mundo", "docs2/b.txt": "segundo arquivo"}
+    fs.close()
+
+def test_remount_keeps_moves_deletes_and_resizes(image):
+    fs, path = image
+    run(fs, "mv docs/b.txt b.txt", "delete c.txt", "append docs/a.txt !!",
+        "resize b.txt 8", "truncate docs/a.txt 1")
+    tree = fs.execute("tree")
+    fs = remount(fs, path)
+    assert fs.execute("tree") == tree
+    assert contents(fs, "docs/a.txt", "b.txt") == {"docs/a.txt": "o", "b.txt": "segundo arquivo"}
+    assert fs.execute("read c.txt").startswith("Erro")
+    fs.close()
+
+def test_remount_keeps_free_space(image):
+    fs, path = image
+    run(fs, "rm docs/b.txt")
+    info = fs.execute("info")
+    fs = remount(fs, path)
+    assert fs.execute("info") == info
+    run(fs, "create novo.txt 5", "write novo.txt depois da remontagem")
+    fs = remount(fs, path)
+    assert contents(fs, "novo.txt", *FILES[:1]) == {
+        "novo.txt": "depois da remontagem", "docs/a.txt": "olá mundo"}
+    fs.close()
+
+def free_index(disk):
+    index = disk.free_extents
+    return [(start, index.lengths[start]) for start in index.starts]
+
+@pytest.mark.parametrize("command", ["delete c.txt", "rm docs/b.txt", "truncate docs/b.txt 1",
+                                     "resize docs/a.txt 1"])
+def test_free_after_remount_keeps_index_consistent(image, command):
+    fs, path = image
+    fs = remount(fs, path)
+    run(fs, command, "create d.txt 4", "write d.txt depois")
+    disk = fs.disk
+    assert free_index(disk) == list(disk.blocks.free_runs())
+    assert disk.free_count == sum(length for _, length in free_index(disk))
+    fs = remount(fs, path)
+    assert free_index(fs.disk) == list(fs.disk.blocks.free_runs())
+    assert contents(fs, "d.txt") == {"d.txt": "depois"}
+    fs.close()
+
+def test_find_after_remount(image):
+    fs, path = image
+    fs = remount(fs, path)
+    assert fs.execute("find / -name *.txt").splitlines() == [
+        "[FILE] /RAIZ/c.txt (1 blocos)", "[FILE] /RAIZ/docs/a.txt (2 blocos)",
+        "[FILE] /RAIZ/docs/b.txt (3 blocos)"]
+    fs.close()
+
+# Recuperação do journal depois de uma queda
+
+@pytest.fixture
+def crash(tmp_path):
+    """Imagem no estado do último checkpoint e o journal de três transações (mkdir a, b e c).
+
+    Retorna (imagem, journal, tamanho do journal depois de cada transação)
+    para montar "discos depois de uma queda" com `crashed`.
+    """
+    path = str(tmp_path / "disco.img")
+    fs = FileSystem(100, image=path, commit_interval=1)
+    fs.sync()
+    with open(path, "rb") as f:
+        image = f.read()
+    sizes = []
+    for name in "abc":
+        run(fs, f"mkdir {name}")
+        sizes.append(fs.image.journal.size())
+    with open(path + ".journal", "rb") as f:
+        journal = f.read()
+    fs.close()
+    return image, journal, sizes
+
+def crashed(tmp_path, image, journal):
+    path = str(tmp_path / "queda.img")
+    with open(path, "wb") as f:
+        f.write(image)
+    with open(path + ".journal", "wb") as f:
+        f.write(journal)
+    return FileSystem.mount(path), path
+
+def test_recovery_replays_committed_transactions(tmp_path, crash):
+    image, journal, sizes = crash
+    assert len(journal) == sizes[-1]
+    fs, path = crashed(tmp_path, image, journal)
+    assert fs.image.recovered == 3
+    assert fs.execute("ls") == "[DIR] a\n[DIR] b\n[DIR] c"
+    assert os.path.getsize(path + ".journal") == 0
+    fs.close()
+
+@pytest.mark.parametrize("cut", [1, JOURNAL_RECORD.size, JOURNAL_RECORD.size + 1, PAGE_SIZE])
+def test_recovery_ignores_torn_transaction(tmp_path, crash, cut):
+    image, journal, sizes = crash
+    fs, _ = crashed(tmp_path, image, journal[:sizes[1] + cut])
+    assert fs.image.recovered == 2
+    assert fs.execute("ls") == "[DIR] a\n[DIR] b"
+    fs.close()
+
+def test_recovery_stops_at_checksum_mismatch(tmp_path, crash):
+    image, journal, sizes = crash
+    # Corrompe um byte de dados da segunda transação: só a primeira é reaplicada
+    corrupted = bytearray(journal)
+    corrupted[sizes[0] + JOURNAL_RECORD.size] ^= 0xFF
+    fs, _ = crashed(tmp_path, image, bytes(corrupted))
+    assert fs.image.recovered == 1
+    assert fs.execute("ls") == "[DIR] a"
+    fs.close()
+
+def test_recovery_without_journal_keeps_checkpoint(tmp_path, crash):
+    image, _, _ = crash
+    fs, _ = crashed(tmp_path, image, b"")
+    assert fs.image.recovered == 0
+    assert fs.execute("ls") == ""
+    fs.close()
+
+# Compactação
+
+def test_defrag_budget_bounds_blocks_moved_per_operation():
+    fs = FileSystem(100_000, backend="bitmap", defrag_budget=4)
+    run(fs, "create s 1", "create big 50000", "write big conteúdo do arquivo grande")
+    run(fs, "delete s")
+    assert fs.blocks_moved == 4
+    for step in range(2, 5):
+        fs.defrag_step()
+        assert fs.blocks_moved == 4 * step
+    run(fs, "defrag")
+    assert fs.current_dir.contents["big"].extents[0][0] == 0
+    assert contents(fs, "big") == {"big": "conteúdo do arquivo grande"}
+
+def test_allocation_evicts_the_cheapest_extent():
+    # [a:10][buraco:1][b:79][buraco:10]: mover `a` para o buraco final basta
+    fs = FileSystem(100, defrag_budget=0)
+    run(fs, "create a 10", "create h 1", "create b 79", "create t 10", "write a dados de a",
+        "write b dados de b", "delete h", "delete t", "create c 11")
+    assert fs.blocks_moved == 10
+    assert contents(fs, "a", "b") == {"a": "dados de a", "b": "dados de b"}